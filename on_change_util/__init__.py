@@ -6,27 +6,48 @@ files and notifies the Lua script to update the script data
 in the running emulator.
 """
 
-from .porylive_processor import PoryliveProcessor
-from .logger import Logger
-from .config import ConfigManager
-from .map_file import MapFileManager
-from .build_manager import BuildManager
-from .script_differ import ScriptDiffer
-from .macro_processor import MacroProcessor
-from .lst_parser import LSTParser
-from .file_manager import FileManager
-from .notification import NotificationManager
+import importlib
 
 __version__ = "1.0.0"
-__all__ = [
-    "PoryliveProcessor",
-    "Logger",
-    "ConfigManager",
-    "MapFileManager",
-    "BuildManager",
-    "ScriptDiffer",
-    "MacroProcessor",
-    "LSTParser",
-    "FileManager",
-    "NotificationManager",
-]
+
+# Submodule of each exported name. They are imported on first access
+# (PEP 562), so running porylive only imports the modules it uses
+_EXPORTS = {
+    "PoryliveProcessor": "porylive_processor",
+    "Logger": "logger",
+    "ConfigManager": "config",
+    "MapFileManager": "map_file",
+    "LabelIndex": "label_index",
+    "BuildManager": "build_manager",
+    "ScriptDiffer": "script_differ",
+    "MacroProcessor": "macro_processor",
+    "LSTParser": "lst_parser",
+    "FileManager": "file_manager",
+    "ArtifactStore": "artifact_store",
+    "GeneratedFilesManifest": "manifest",
+    "BaselineStore": "baseline",
+    "MemoCache": "memo_cache",
+    "SessionRecorder": "recorder",
+    "PoryscriptCache": "poryscript_cache",
+    "NotificationManager": "notification",
+    "SpeculationServer": "speculation",
+    "CapacityManager": "capacity",
+    "Scheduler": "scheduler",
+    "CycleCancelled": "scheduler",
+    "StandinEmulator": "standin",
+    "StandinServer": "standin",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    """Import an exported name from its submodule on first access"""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Iterable, Set, Tuple
+from .logger import Logger
+
+# Number of unreferenced blobs tolerated before a garbage collection pass deletes them
+GC_THRESHOLD = 64
+
+class ArtifactStore:
+    """Content-addressed store for routine binaries
+
+    Each blob is named after the hash of its bytes, so a routine that is
+    byte-identical to a previous run is never rewritten. Blobs are written
+    to a temporary file and atomically renamed into place.
+    """
+
+    def __init__(self, logger: Logger, store_dir: Path):
+        self.logger = logger
+        self.store_dir = store_dir
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        """Get the content hash used to name a blob"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def blob_path(self, digest: str) -> Path:
+        """Get the path of the blob with the given digest"""
+        return self.store_dir / f"{digest}.bin"
+
+    def put(self, data: bytes) -> Tuple[Path, bool]:
+        """Store data, returning the blob path and whether it had to be written"""
+        path = self.blob_path(self.digest(data))
+        if path.exists():
+            return path, False
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path, True
+
+    def collect_garbage(self, referenced_files: Iterable[str]):
+        """Delete blobs that are no longer referenced, once enough of them have piled up"""
+        gc_start = time.perf_counter()
+        if not self.store_dir.exists():
+            return
+
+        referenced: Set[str] = {Path(filename).name for filename in referenced_files}
+        # Temporary files are another writer's blobs, not renamed into place yet
+        stale = [path for path in self.store_dir.iterdir()
+                 if path.name not in referenced and not path.name.endswith(".tmp")]
+        if len(stale) >= GC_THRESHOLD:
+            for path in stale:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            self.logger.log_message(f"Removed {len(stale)} unreferenced script binaries")
+
+        gc_end = time.perf_counter()
+        self.logger.log_profiling(f"Artifact garbage collection took {gc_end - gc_start:.4f}s, {len(stale)} stale blobs")
@@ -0,0 +1,92 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from .logger import Logger
+
+class BaselineStore:
+    """Keeps the last injected state of each source for rolling diffs
+
+    In rolling baseline mode each save is diffed against the stripped
+    listing of the last successfully processed save instead of the listing
+    from the original `make live`. A baseline is staged while a cycle runs
+    and only committed once its changes have been sent to porylive.lua.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path):
+        self.logger = logger
+        self.baseline_dir = project_dir / ".porylive" / "baseline"
+
+    def _paths(self, source: str, staged: bool = False) -> Tuple[Path, Path]:
+        """Get the stripped listing and state paths of a source's baseline"""
+        name = source.replace('/', '_')
+        suffix = ".staged" if staged else ""
+        return (self.baseline_dir / f"{name}.stripped{suffix}",
+                self.baseline_dir / f"{name}.json{suffix}")
+
+    @staticmethod
+    def _listing_version(src_lst_old: Path) -> List[int]:
+        """Identify the original listing, which changes with every `make live`"""
+        stat = src_lst_old.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def load(self, source: str, src_lst_old: Path) -> Optional[Tuple[List[str], Set[str]]]:
+        """Load a source's baseline stripped listing and new script labels, if still valid"""
+        stripped_path, state_path = self._paths(source)
+        try:
+            with open(state_path, "r") as f:
+                state = json.load(f)
+            if state['original_listing'] != self._listing_version(src_lst_old):
+                return None
+            with open(stripped_path, "r") as f:
+                stripped_lines = f.read().split("\n")
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+        if stripped_lines == [""]:
+            stripped_lines = []
+        return stripped_lines, set(state['new_script_labels'])
+
+    def stage(self, source: str, src_lst_old: Path, stripped_lines: List[str], new_script_labels: Set[str]):
+        """Write a source's next baseline without making it current yet"""
+        self.baseline_dir.mkdir(parents=True, exist_ok=True)
+        stripped_path, state_path = self._paths(source, staged=True)
+        with open(stripped_path, "w") as f:
+            f.write("\n".join(stripped_lines))
+        with open(state_path, "w") as f:
+            json.dump({
+                'original_listing': self._listing_version(src_lst_old),
+                'new_script_labels': sorted(new_script_labels),
+            }, f)
+
+    def commit(self, source: str):
+        """Make a source's staged baseline current"""
+        staged_paths = self._paths(source, staged=True)
+        current_paths = self._paths(source)
+        try:
+            for staged_path, current_path in zip(staged_paths, current_paths):
+                os.replace(staged_path, current_path)
+        except FileNotFoundError:
+            return
+        self.logger.log_profiling(f"Committed rolling baseline for {source}")
+
+    def export(self, source: str) -> Optional[Dict]:
+        """Get a source's current baseline as JSON data, e.g. to memoize it"""
+        stripped_path, state_path = self._paths(source)
+        try:
+            with open(state_path, "r") as f:
+                state = json.load(f)
+            with open(stripped_path, "r") as f:
+                stripped = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return {'state': state, 'stripped': stripped}
+
+    def restore(self, source: str, exported: Dict):
+        """Stage a baseline previously returned by export"""
+        self.baseline_dir.mkdir(parents=True, exist_ok=True)
+        stripped_path, state_path = self._paths(source, staged=True)
+        with open(stripped_path, "w") as f:
+            f.write(exported['stripped'])
+        with open(state_path, "w") as f:
+            json.dump(exported['state'], f)
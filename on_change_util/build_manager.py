@@ -1,8 +1,15 @@
 import os
+import signal
 import subprocess
 import sys
 from pathlib import Path
+from typing import Callable, Optional
 from .logger import Logger
+from .poryscript_cache import PoryscriptCache
+from .scheduler import CycleCancelled
+
+# Seconds between checks for cancellation while make is running
+MAKE_POLL_INTERVAL = 0.05
 
 class BuildManager:
     """Handles build processes and external tool execution"""
@@ -11,60 +18,106 @@ class BuildManager:
         self.logger = logger
         self.project_dir = project_dir
 
-    def try_process_poryscript_file(self, pory_file_path: Path):
-        """Attempt to invoke tools/poryscript to process a .pory file"""
+    def try_process_poryscript_file(self, pory_file: str, cache: PoryscriptCache) -> str:
+        """Compile a .pory file with tools/poryscript, unless its output is cached, and return its .inc file"""
+        pory_file_path = self.project_dir / pory_file
+        inc_file = str(Path(pory_file).with_suffix(".inc"))
         filename = pory_file_path.name
-        try:
+
+        key = cache.compute_key(pory_file_path)
+        output = cache.get(key)
+        if output is not None:
+            self.logger.log_message(f"Using cached poryscript output for {filename}")
+        else:
             self.logger.log_message(f"Processing pory file: {filename}")
-            result = subprocess.run(
-                [
-                    "tools/poryscript/poryscript",
-                    "-cc", "tools/poryscript/command_config.json",
-                    "-fc", "tools/poryscript/font_config.json",
-                    "-i", pory_file_path,
-                    "-o", pory_file_path.with_suffix(".inc"),
-                ],
-                check=True,
-                capture_output=True,
-                cwd=self.project_dir
-            )
-            if result.stderr:
-                error_message = result.stderr.decode('utf-8').strip().split('\n')
+            output_path = cache.output_path(key)
+            tmp_output_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                result = subprocess.run(
+                    [
+                        "tools/poryscript/poryscript",
+                        "-cc", "tools/poryscript/command_config.json",
+                        "-fc", "tools/poryscript/font_config.json",
+                        "-i", pory_file_path,
+                        "-o", tmp_output_path,
+                    ],
+                    check=True,
+                    capture_output=True,
+                    cwd=self.project_dir
+                )
+                if result.stderr:
+                    error_message = result.stderr.decode('utf-8').strip().split('\n')
+                    error_message.insert(0, f"Error while processing {pory_file_path}:")
+                    self.logger.log_message(*error_message)
+                    sys.exit(1)
+            except subprocess.CalledProcessError as e:
+                error_message = e.stderr.decode('utf-8').strip().split('\n')
                 error_message.insert(0, f"Error while processing {pory_file_path}:")
                 self.logger.log_message(*error_message)
                 sys.exit(1)
-        except subprocess.CalledProcessError as e:
-            error_message = e.stderr.decode('utf-8').strip().split('\n')
-            error_message.insert(0, f"Error while processing {pory_file_path}:")
-            self.logger.log_message(*error_message)
-            sys.exit(1)
 
-    def run_make_live_update(self, build_dir: Path) -> bool:
-        """Run make live-update command"""
+            with open(tmp_output_path, "rb") as f:
+                output = f.read()
+            tmp_output_path.unlink()
+            cache.put(key, output)
+
+        if not cache.write_inc_file(inc_file, output):
+            self.logger.log_message(f"{inc_file} is already up to date")
+        return inc_file
+
+    def run_make_live_update(self, build_dir: Path, is_cancelled: Optional[Callable[[], bool]] = None,
+                             cwd: Optional[Path] = None) -> bool:
+        """Run make live-update command, killing it if is_cancelled returns True while it runs
+
+        cwd defaults to the project directory, a shadow tree of it assembles unsaved contents instead.
+        """
         env = os.environ.copy()
         if "modern" in str(build_dir.name):
             env["MODERN"] = "1"
 
-        try:
-            result = subprocess.run(
-                ["make", "live-update"],
-                check=True,
-                capture_output=True,
-                env=env,
-                cwd=self.project_dir
-            )
-            if result.stderr:
-                # Convert result.stderr from bytes to string
-                error_message = result.stderr.decode('utf-8').strip().split('\n')
-                error_message.insert(0, "Error while assembling scripts:")
-                self.logger.log_message(*error_message)
-                sys.exit(1)
-            return True
+        # Start make in its own process group so the assembler it spawns can be killed with it
+        process = subprocess.Popen(
+            ["make", "live-update"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            cwd=cwd or self.project_dir,
+            start_new_session=True
+        )
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=MAKE_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if is_cancelled is not None and is_cancelled():
+                    self.kill_process_group(process)
+                    raise CycleCancelled("superseded during make live-update")
+
+        if process.returncode != 0:
+            self.logger.log_message(f"make live-update failed with return code {process.returncode}")
+            if stdout:
+                self.logger.log_message(f"stdout: {stdout}")
+            if stderr:
+                self.logger.log_message(f"stderr: {stderr}")
+            sys.exit(1)
 
-        except subprocess.CalledProcessError as e:
-            self.logger.log_message(f"make live-update failed with return code {e.returncode}")
-            if e.stdout:
-                self.logger.log_message(f"stdout: {e.stdout}")
-            if e.stderr:
-                self.logger.log_message(f"stderr: {e.stderr}")
+        if stderr:
+            # Convert stderr from bytes to string
+            error_message = stderr.decode('utf-8').strip().split('\n')
+            error_message.insert(0, "Error while assembling scripts:")
+            self.logger.log_message(*error_message)
             sys.exit(1)
+        return True
+
+    def kill_process_group(self, process: subprocess.Popen):
+        """Terminate a process started in its own session, along with its children"""
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+        process.communicate()
+        self.logger.log_message("Stopped make live-update for a newer save")
@@ -0,0 +1,136 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from .logger import Logger
+from .porylive_types import GeneratedFileInfo
+
+def _file_version(path: Path) -> List[int]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return []
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _map_key(entry: GeneratedFileInfo) -> str:
+    """Key a script the way porylive.lua does, override scripts by their original address and new scripts by label"""
+    address = entry['address'] or 0
+    return f"new_{entry['label']}" if address == 0 else f"{address:x}"
+
+class CapacityManager:
+    """Keeps the injected scripts within the script buffer and override slots of porylive.lua
+
+    Every generated file takes its size in the script buffer, which ends
+    with a marker byte, and every script with an original address takes an
+    override slot. When the scripts of a long session no longer fit, the
+    ones edited least recently are evicted: they are left out of
+    porylive_generated_files.lua, so the game runs their ROM original again
+    until there is room for them. Scripts edited in the current save, and
+    scripts that an injected script points to, are never evicted.
+
+    When each script was last edited, and which ones are evicted, is kept in
+    porylive_capacity.json and starts over after `make live`.
+    """
+
+    def __init__(self, logger: Logger, build_dir: Path, buffer_size: int, overrides_size: int):
+        self.logger = logger
+        self.state_path = build_dir / "porylive_capacity.json"
+        self.buffer_size = buffer_size
+        self.overrides_size = overrides_size
+
+    def _load_state(self, listings: Dict[str, List[int]]) -> Dict:
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            if state.get('listings') == listings:
+                return state
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {'listings': listings, 'sequence': 0, 'edits': {}, 'evicted': []}
+
+    def _write_state(self, state: Dict):
+        tmp_path = self.state_path.with_name(f".{self.state_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def usage(self, entries: List[GeneratedFileInfo], sizes: Dict[str, int]) -> Tuple[int, int]:
+        """Get the script buffer bytes and override slots a list of generated files takes"""
+        scripts = {_map_key(entry): entry for entry in entries}
+        buffer_used = sum(sizes[entry['label']] for entry in scripts.values())
+        overrides_used = sum(1 for entry in scripts.values() if entry['address'])
+        return buffer_used, overrides_used
+
+    def select(self, entries: List[GeneratedFileInfo], original_listings: List[Path]) -> Set[str]:
+        """Choose the scripts to leave out of porylive_generated_files.lua, returning their labels"""
+        select_start = time.perf_counter()
+        state = self._load_state({str(path): _file_version(path) for path in original_listings})
+        edits: Dict[str, List] = state['edits']
+
+        # A script is edited whenever its generated file changes
+        labels = set()
+        edited_now = set()
+        for entry in entries:
+            label = entry['label']
+            labels.add(label)
+            digest = Path(entry['filename']).stem
+            record = edits.get(label)
+            if record is None or record[1] != digest:
+                state['sequence'] += 1
+                try:
+                    size = os.path.getsize(entry['filename'])
+                except OSError:
+                    size = 0
+                edits[label] = [state['sequence'], digest, size]
+                edited_now.add(label)
+
+        # Forget scripts that are no longer generated, e.g. reverted ones
+        state['edits'] = edits = {label: record for label, record in edits.items() if label in labels}
+        sizes = {label: record[2] for label, record in edits.items()}
+        previously_evicted = set(state['evicted'])
+
+        buffer_capacity = self.buffer_size - 1  # The last byte marks the end of the buffer
+        injected = list(entries)
+        evicted: List[str] = []
+        buffer_used, overrides_used = self.usage(injected, sizes)
+        while buffer_used > buffer_capacity or overrides_used > self.overrides_size:
+            candidate = self._next_eviction(injected, edited_now, edits, buffer_used > buffer_capacity)
+            if candidate is None:
+                self.logger.log_message(
+                    f"Scripts do not fit even after evictions ({buffer_used} / {buffer_capacity} bytes, "
+                    f"{overrides_used} / {self.overrides_size} overrides)",
+                    "Revert some edited scripts or run make live")
+                break
+
+            label = candidate['label']
+            injected = [entry for entry in injected if entry['label'] != label]
+            evicted.append(label)
+            reason = (f"script buffer full ({buffer_used} / {buffer_capacity} bytes)" if buffer_used > buffer_capacity
+                      else f"override slots full ({overrides_used} / {self.overrides_size})")
+            buffer_used, overrides_used = self.usage(injected, sizes)
+            if label not in previously_evicted:
+                self.logger.log_message(f"Evicted {label}, last edited {state['sequence'] - edits[label][0]} "
+                                        f"edit(s) ago, back to its ROM original: {reason}")
+
+        for label in sorted(previously_evicted & labels - edited_now - set(evicted)):
+            self.logger.log_message(f"Restored {label}, there is room for it again")
+        state['evicted'] = evicted
+
+        self._write_state(state)
+        select_end = time.perf_counter()
+        self.logger.log_profiling(f"Capacity check took {select_end - select_start:.4f}s, "
+                                  f"{buffer_used} / {buffer_capacity} bytes, "
+                                  f"{overrides_used} / {self.overrides_size} overrides, {len(evicted)} evicted")
+        return set(evicted)
+
+    def _next_eviction(self, injected: List[GeneratedFileInfo], edited_now: Set[str], edits: Dict[str, List],
+                       over_buffer: bool) -> Optional[GeneratedFileInfo]:
+        """Find the least recently edited script that can be evicted, if any"""
+        referenced = {adjustment['label'] for entry in injected for adjustment in entry.get('lua_adjustments') or []
+                      if adjustment['label'] != entry['label']}
+        candidates = [entry for entry in injected
+                      if entry['label'] not in edited_now and entry['label'] not in referenced
+                      # New scripts do not take an override slot
+                      and (over_buffer or entry['address'])]
+        return min(candidates, key=lambda entry: edits[entry['label']][0], default=None)
@@ -1,7 +1,8 @@
 import json
+import os
 import re
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from .logger import Logger
 
 class ConfigManager:
@@ -47,6 +48,80 @@ class ConfigManager:
                 self._macro_data_cache = json.load(f)
         return self._macro_data_cache
 
+    def set_macro_data(self, macro_data: Dict):
+        """Use already loaded macro data, e.g. one shared with a worker process"""
+        self._macro_data_cache = macro_data
+
+    @property
+    def rolling_baseline(self) -> bool:
+        """Whether to diff against the last injected state instead of the original listing"""
+        return os.getenv("PORYLIVE_ROLLING_BASELINE", "0") == "1"
+
+    @property
+    def debounce_seconds(self) -> float:
+        """How long a save waits for newer saves before it is processed"""
+        return int(os.getenv("PORYLIVE_DEBOUNCE_MS", "50")) / 1000
+
+    @property
+    def memo_budget_bytes(self) -> int:
+        """Disk budget of the memo cache of processed states, 0 to disable it"""
+        return int(os.getenv("PORYLIVE_MEMO_BUDGET_MB", "64")) * 1024 * 1024
+
+    @property
+    def record_sessions(self) -> bool:
+        """Whether to record every processing cycle into a session archive for replays"""
+        return os.getenv("PORYLIVE_RECORD", "0") == "1"
+
+    @property
+    def coalesce_seconds(self) -> float:
+        """How long the built-in watcher waits for more changes before processing a batch"""
+        return int(os.getenv("PORYLIVE_COALESCE_MS", "20")) / 1000
+
+    @property
+    def watch_poll_seconds(self) -> float:
+        """How often the built-in watcher checks files when inotify is not available"""
+        return int(os.getenv("PORYLIVE_POLL_MS", "250")) / 1000
+
+    @property
+    def force_polling(self) -> bool:
+        """Whether the built-in watcher polls files even when inotify is available"""
+        return os.getenv("PORYLIVE_WATCH_POLL", "0") == "1"
+
+    @property
+    def speculate_port(self) -> int:
+        """Port to receive unsaved editor buffers on, 0 to disable speculative processing"""
+        return int(os.getenv("PORYLIVE_SPECULATE_PORT", "1390"))
+
+    @property
+    def speculate_budget_bytes(self) -> int:
+        """Disk budget of the speculative results not used by a save yet"""
+        return int(os.getenv("PORYLIVE_SPECULATE_BUDGET_MB", "8")) * 1024 * 1024
+
+    @property
+    def script_buffer_size(self) -> int:
+        """Size of the script buffer porylive.lua writes the generated files into"""
+        return int(os.getenv("PORYLIVE_SCRIPT_BUFFER_SIZE", "102400"))
+
+    @property
+    def script_overrides_size(self) -> int:
+        """Number of override slots porylive.lua has for scripts with an original address"""
+        return int(os.getenv("PORYLIVE_SCRIPT_OVERRIDES", "200"))
+
+    @property
+    def configured_endpoints(self) -> List[Tuple[str, int]]:
+        """The porylive.lua instances to notify, from a comma-separated list of ports or host:port pairs"""
+        endpoints = []
+        for endpoint in os.getenv("PORYLIVE_ENDPOINTS", "").split(","):
+            endpoint = endpoint.strip()
+            if not endpoint:
+                continue
+            host, _, port = endpoint.rpartition(":")
+            try:
+                endpoints.append((host or "localhost", int(port)))
+            except ValueError:
+                self.logger.log_message(f"Ignoring invalid PORYLIVE_ENDPOINTS entry: {endpoint}")
+        return endpoints
+
     def get_macros_to_adjust(self, src_file: str) -> Dict:
         """Get macro adjustment data for a specific file"""
         macro_data = self.load_macro_data()
@@ -0,0 +1,111 @@
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+# e_ident fields
+ELF_MAGIC = b"\x7fELF"
+ELFCLASS32 = 1
+ELFDATA2LSB = 1
+EM_ARM = 40
+
+# Section header and symbol constants
+SHT_SYMTAB = 2
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STT_FUNC = 2
+STT_SECTION = 3
+
+ELF32_HEADER = struct.Struct("<16sHHIIIIIHHHHHH")
+ELF32_SECTION_HEADER = struct.Struct("<IIIIIIIIII")
+ELF32_SYMBOL = struct.Struct("<IIIBBH")
+
+# Address prefixes kept by `make syms`: EWRAM, IWRAM and ROM
+SYM_ADDRESS_PREFIXES = ("02", "03", "08", "09")
+
+class ElfSymbolError(Exception):
+    """The file is not a little-endian ELF32 file with a symbol table"""
+
+class ElfSymbol(NamedTuple):
+    address: int
+    binding: str  # "l" or "g", as in the .sym file
+    size: int
+    name: str
+
+def read_elf_symbols(elf_path: Path) -> List[ElfSymbol]:
+    """Read the local and global symbols of a linked ELF32 file in a single pass over its symbol table
+
+    Thumb function addresses have their low bit cleared, like objdump does
+    for ARM, so addresses match the ones in a .sym file. Weak symbols are
+    left out, as `make syms` does not format them into .sym lines either.
+    """
+    with open(elf_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < ELF32_HEADER.size or mm[:4] != ELF_MAGIC:
+                raise ElfSymbolError(f"{elf_path} is not an ELF file")
+            if mm[4] != ELFCLASS32 or mm[5] != ELFDATA2LSB:
+                raise ElfSymbolError(f"{elf_path} is not a little-endian ELF32 file")
+
+            header = ELF32_HEADER.unpack_from(mm, 0)
+            is_arm = header[2] == EM_ARM  # e_machine
+            section_offset, section_entry_size, section_count = header[6], header[11], header[12]
+
+            sections = [ELF32_SECTION_HEADER.unpack_from(mm, section_offset + i * section_entry_size)
+                        for i in range(section_count)]
+            symtab = next((section for section in sections if section[1] == SHT_SYMTAB), None)
+            if symtab is None:
+                raise ElfSymbolError(f"{elf_path} has no symbol table")
+
+            # sh_offset, sh_size and sh_link, which is the index of the symbol name table
+            symtab_offset, symtab_size, strtab_index = symtab[4], symtab[5], symtab[6]
+            strtab = sections[strtab_index]
+            names = mm[strtab[4]:strtab[4] + strtab[5]]
+            symbol_data = mm[symtab_offset:symtab_offset + symtab_size]
+
+    symbols = []
+    for name_offset, value, size, info, _, _ in ELF32_SYMBOL.iter_unpack(symbol_data):
+        binding = info >> 4
+        symbol_type = info & 0xf
+        if binding not in (STB_LOCAL, STB_GLOBAL) or symbol_type == STT_SECTION or not name_offset:
+            continue
+        if is_arm and symbol_type == STT_FUNC:
+            value &= ~1
+        name = names[name_offset:names.index(b"\0", name_offset)].decode("utf-8", "replace")
+        symbols.append(ElfSymbol(value, "l" if binding == STB_LOCAL else "g", size, name))
+    return symbols
+
+def format_sym_lines(symbols: List[ElfSymbol]) -> List[str]:
+    """Format symbols like `make syms` does: memory-mapped addresses only, sorted and without duplicates"""
+    lines = {f"{symbol.address:08x} {symbol.binding} {symbol.size:08x} {symbol.name}" for symbol in symbols}
+    return sorted(line for line in lines if line.startswith(SYM_ADDRESS_PREFIXES))
+
+def write_sym_file(elf_path: Path, sym_path: Path) -> Dict[str, int]:
+    """Write a .sym file from an ELF file and return its symbol index
+
+    The index keeps the first address of each name in .sym file order, like
+    MapFileManager.load_sym_file does.
+    """
+    lines = format_sym_lines(read_elf_symbols(elf_path))
+    tmp_path = sym_path.with_name(f".{sym_path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines))
+        if lines:
+            f.write("\n")
+    tmp_path.replace(sym_path)
+
+    symbol_index: Dict[str, int] = {}
+    for line in lines:
+        address, _, _, name = line.split(" ", 3)
+        if name not in symbol_index:
+            symbol_index[name] = int(address, 16)
+    return symbol_index
+
+def read_sym_file(sym_path: Path) -> Dict[str, int]:
+    """Read the symbol index of a .sym file, e.g. one written by `make syms`"""
+    symbol_index: Dict[str, int] = {}
+    with open(sym_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 4 and parts[3] not in symbol_index:
+                symbol_index[parts[3]] = int(parts[0], 16)
+    return symbol_index
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where porylive runs under WSL instead
+    fcntl = None
+
+@contextmanager
+def file_lock(lock_path: Path, shared: bool = False):
+    """Hold an advisory lock on a lock file, shared between porylive processes
+
+    Without fcntl the lock is a no-op, and overlapping saves are not serialized.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .logger import Logger
+from .porylive_types import SECTION_PATTERN, SUPPORTED_FILES
+
+# Bumped whenever the layout of the index changes
+LABEL_INDEX_VERSION = 2
+
+# Directory of the index, relative to the build directory
+LABEL_INDEX_DIR = "porylive_index"
+
+# Macro params that may name a symbol
+SYMBOL_PATTERN = re.compile(r"^[A-Za-z_.$][\w.$]*$")
+
+def _is_hex(value: str) -> bool:
+    return bool(value) and all(c in "0123456789abcdefABCDEF" for c in value)
+
+def _file_version(path: Path) -> List[int]:
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+def index_listing(lst_path: Path) -> Tuple[List[str], Set[str]]:
+    """List the labels of a listing and the names its macro invocations may refer to, in a single pass"""
+    labels: List[str] = []
+    names: Set[str] = set()
+
+    with open(lst_path, "r") as f:
+        for line in f:
+            if SECTION_PATTERN.search(line):
+                break
+
+        for line in f:
+            line = line.rstrip()
+            if not line or line.startswith("\x0c") or "ARM GAS" in line:
+                continue
+            parts = line.split(';')[0].split()
+            if len(parts) > 1 and parts[1].startswith('.'):
+                continue
+
+            # Label lines, detected like LSTParser does
+            if ':' in line and line.lstrip().split()[0].isdigit():
+                labels.append(line.split(':')[0].split()[-1])
+            elif len(parts) >= 5 and _is_hex(parts[1]) and _is_hex(parts[2]):
+                # A line with an address, its first bytes and the macro that emitted them
+                names.update(param for param in ",".join(parts[4:]).split(",") if SYMBOL_PATTERN.match(param))
+    return labels, names
+
+def _macro_symbol_names(macro_data: Any, names: Set[str]):
+    """Collect the literal symbol names of the macro data, like AnimTask_IsDoubleBattle"""
+    if isinstance(macro_data, dict):
+        name = macro_data.get("name")
+        if isinstance(name, str) and not name.startswith("$"):
+            names.add(name)
+        for value in macro_data.values():
+            _macro_symbol_names(value, names)
+    elif isinstance(macro_data, list):
+        for value in macro_data:
+            _macro_symbol_names(value, names)
+
+def write_label_index(build_dir: Path, sym_path: Path, symbol_index: Dict[str, int],
+                      macro_data_path: Path) -> Path:
+    """Index the original listing of every supported file, returning the index directory
+
+    symbols.json holds what is needed on every save: the address of every
+    label and of every other symbol the listings or the macro data refer to.
+    """
+    index_dir = build_dir / LABEL_INDEX_DIR
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    referenced: Set[str] = set()
+    try:
+        with open(macro_data_path, "r") as f:
+            _macro_symbol_names(json.load(f), referenced)
+    except FileNotFoundError:
+        pass
+
+    listings = {}
+    label_addresses: Dict[str, Optional[int]] = {}
+    for source in SUPPORTED_FILES:
+        lst_path = build_dir / source.replace('.s', '.lst')
+        if not lst_path.exists():
+            continue
+        labels, names = index_listing(lst_path)
+        listings[source] = _file_version(lst_path)
+        for label in labels:
+            label_addresses.setdefault(label, symbol_index.get(label))
+        referenced.update(names)
+
+    _write_json(index_dir / "symbols.json", {
+        'version': LABEL_INDEX_VERSION,
+        'sym_file': str(sym_path.resolve()),
+        'sym_version': _file_version(sym_path),
+        'listings': listings,
+        'labels': label_addresses,
+        'targets': {name: symbol_index[name] for name in sorted(referenced)
+                    if name in symbol_index and name not in label_addresses},
+    })
+    return index_dir
+
+def _write_json(path: Path, content: Any):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+class LabelIndex:
+    """The label index written by porylive_get_addresses.py during `make live`
+
+    The index is only used while the sym file and the original listings it
+    was built from are unchanged.
+    """
+
+    def __init__(self, logger: Logger, build_dir: Path):
+        self.logger = logger
+        self.index_dir = build_dir / LABEL_INDEX_DIR
+        self.build_dir = build_dir
+
+        self.sym_file: Optional[Path] = None
+        self.labels: Dict[str, Optional[int]] = {}
+        self.targets: Dict[str, int] = {}
+
+    def load(self) -> bool:
+        """Load the addresses of the index, returning whether it is present and up to date"""
+        load_start = time.perf_counter()
+        try:
+            with open(self.index_dir / "symbols.json", "r") as f:
+                symbols = json.load(f)
+            if symbols.get('version') != LABEL_INDEX_VERSION:
+                return False
+            sym_file = Path(symbols['sym_file'])
+            if _file_version(sym_file) != symbols['sym_version']:
+                return False
+            for source, version in symbols['listings'].items():
+                if _file_version(self.build_dir / source.replace('.s', '.lst')) != version:
+                    return False
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return False
+
+        self.sym_file = sym_file
+        self.labels = symbols['labels']
+        self.targets = symbols['targets']
+
+        load_end = time.perf_counter()
+        self.logger.log_profiling(f"Label index load took {load_end - load_start:.4f}s, "
+                                  f"{len(self.labels)} labels, {len(self.targets)} other symbols")
+        return True
@@ -6,16 +6,19 @@ from typing import Optional
 class Logger:
     """Handles all logging functionality for porylive"""
 
-    def __init__(self, project_dir: Path, profiling: bool = False):
+    def __init__(self, project_dir: Path, profiling: bool = False, prefix: str = ""):
         self.project_dir = project_dir
         self.profiling = profiling
         self.log_file_path = project_dir / ".porylive" / "porylive_on_change.log"
+        # Prepended to every message, e.g. to tell speculative processing apart
+        self.prefix = prefix
 
     def log_message(self, *args):
         """Log a message to porylive_watchman.log with timestamp. The file should be created by the Makefile"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         with open(self.log_file_path, "a") as f:
             if args:
+                args = (f"{self.prefix}{args[0]}",) + args[1:]
                 # First argument gets timestamp, rest are joined with newline + 18 spaces
                 if len(args) == 1:
                     f.write(f"[{timestamp}] {args[0]}\n")
@@ -1,9 +1,15 @@
+import os
+import time
 from pathlib import Path
-from typing import Dict, Set
+from typing import Dict, List, Set, Tuple
 from .logger import Logger
 from .map_file import MapFileManager
 from .macro_processor import MacroProcessor
-from .porylive_types import RoutineData, ScriptParams
+from .porylive_types import LuaAdjustment, RoutineData, ScriptParams
+from .workers import adjust_routines_parallel, in_worker
+
+# Number of routines needing macro adjustment before the work is split across worker processes
+PARALLEL_ADJUST_THRESHOLD = 128
 
 class LSTParser:
     """Handles LST file parsing and routine extraction"""
@@ -56,7 +62,7 @@ class LSTParser:
                         routines[current_script["label"]] = {
                             'scripts': current_script["scripts"],
                             'starting_offset': current_script["offset"],
-                            'original_address': self.map_file_manager.get_sym_file_address(current_script["label"]),
+                            'original_address': self.map_file_manager.get_label_address(current_script["label"]),
                         }
 
                     # Start new script
@@ -132,28 +138,55 @@ class LSTParser:
             routines[current_script["label"]] = {
                 'starting_offset': current_script["offset"],
                 'scripts': current_script["scripts"],
-                'original_address': self.map_file_manager.get_sym_file_address(current_script["label"]),
+                'original_address': self.map_file_manager.get_label_address(current_script["label"]),
             }
 
         # Process routines to adjust data from macros
-        for label, routine in routines.items():
-            if len(routine["scripts"]) == 0:
-                continue
-            data = bytearray()
-            lua_adjustments = []
-            for script in routine["scripts"]:
-                if needs_macro_adjustment:
-                    script_data, _lua_adjustments = self.macro_processor.adjust_data_from_macro(
-                        routines, script, src_file, new_script_labels, updated_scripts)
-                    for adjustment in _lua_adjustments:
-                        adjustment["offset"] += len(data)
-                        lua_adjustments.append(adjustment)
-                else:
-                    script_data = script["data"]
-                data.extend(script_data)
-            routines[label]["data"] = bytes(data)
-            routines[label]["lua_adjustments"] = lua_adjustments
+        self.adjust_routines(routines, src_file, needs_macro_adjustment, new_script_labels, updated_scripts)
 
         # Filter out routines that don't have any scripts
         routines = {k: v for k, v in routines.items() if v["scripts"]}
         return routines
+
+    def adjust_routine(self, routines: Dict[str, RoutineData], routine: RoutineData, src_file: str,
+                       needs_macro_adjustment: bool, new_script_labels: Set[str],
+                       updated_scripts: Set[str]) -> Tuple[bytes, List[LuaAdjustment]]:
+        """Adjust the data of a single routine from macros and return it with its Lua adjustments"""
+        data = bytearray()
+        lua_adjustments = []
+        for script in routine["scripts"]:
+            if needs_macro_adjustment:
+                script_data, _lua_adjustments = self.macro_processor.adjust_data_from_macro(
+                    routines, script, src_file, new_script_labels, updated_scripts)
+                for adjustment in _lua_adjustments:
+                    adjustment["offset"] += len(data)
+                    lua_adjustments.append(adjustment)
+            else:
+                script_data = script["data"]
+            data.extend(script_data)
+        return bytes(data), lua_adjustments
+
+    def adjust_routines(self, routines: Dict[str, RoutineData], src_file: str, needs_macro_adjustment: bool,
+                        new_script_labels: Set[str], updated_scripts: Set[str]):
+        """Adjust the data of every routine, partitioning large batches across worker processes"""
+        adjust_start = time.perf_counter()
+        labels = [label for label, routine in routines.items() if len(routine["scripts"]) > 0]
+
+        if (needs_macro_adjustment and len(labels) >= PARALLEL_ADJUST_THRESHOLD
+                and not in_worker() and (os.cpu_count() or 1) > 1):
+            results = adjust_routines_parallel(self.logger, self.macro_processor.config_manager,
+                                               self.map_file_manager, routines, labels, src_file,
+                                               new_script_labels, updated_scripts)
+        else:
+            results = [
+                self.adjust_routine(routines, routines[label], src_file, needs_macro_adjustment,
+                                    new_script_labels, updated_scripts)
+                for label in labels
+            ]
+
+        for label, (data, lua_adjustments) in zip(labels, results):
+            routines[label]["data"] = data
+            routines[label]["lua_adjustments"] = lua_adjustments
+
+        adjust_end = time.perf_counter()
+        self.logger.log_profiling(f"Macro adjustment of {len(labels)} routine(s) took {adjust_end - adjust_start:.4f}s")
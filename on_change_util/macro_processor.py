@@ -5,6 +5,7 @@ from .logger import Logger
 from .config import ConfigManager
 from .map_file import MapFileManager
 from .conditional_processor import ConditionalProcessor
+from .relocation import RelocationCompiler
 from .porylive_types import ScriptParams, RoutineData, LuaAdjustment
 
 class MacroProcessor:
@@ -15,6 +16,8 @@ class MacroProcessor:
         self.config_manager = config_manager
         self.map_file_manager = map_file_manager
         self.conditional_processor = ConditionalProcessor(logger)
+        self.relocation_compiler = RelocationCompiler(self)
+        self._macro_lookup_cache: Dict[Tuple[str, str], Any] = {}
 
     def _find_matching_macro(self, script_name: str, macros_to_adjust: Dict[str, Any]) -> Any:
         """Find a macro definition that matches the script name, supporting both exact matches and regex patterns
@@ -98,10 +101,57 @@ class MacroProcessor:
         
         return params
 
+    def find_macro(self, script_name: str, macros_to_adjust: Dict[str, Any], src_file: str) -> Any:
+        """Find the macro definition for a script name, caching the result per source file"""
+        key = (src_file, script_name)
+        if key not in self._macro_lookup_cache:
+            self._macro_lookup_cache[key] = self._find_matching_macro(script_name, macros_to_adjust)
+        return self._macro_lookup_cache[key]
+
+    def _select_adjustments(self, script: ScriptParams, macro_info: Any) -> List[Dict[str, Any]]:
+        """Select the adjustments of a macro, evaluating conditional macros against the script"""
+        if isinstance(macro_info, dict) and ("$condition" in macro_info or "$if" in macro_info):
+            # Handle conditional macros
+            return self.conditional_processor.process_conditional_macro(script, macro_info)
+        elif isinstance(macro_info, list):
+            # Handle non-conditional macros (when macro_info is a list)
+            return macro_info
+        else:
+            # Exit with error
+            self.logger.log_message(f"[adjust_data_from_macro] Unknown macro_info type for {script['name']}: {macro_info}")
+            sys.exit(1)
+
     def adjust_data_from_macro(self, routines: Dict[str, RoutineData], script: ScriptParams,
+                               src_file: str, new_script_labels: set, updated_scripts: set) -> Tuple[bytearray, List[LuaAdjustment]]:
+        """Adjust script data based on macro definitions
+
+        The macro is applied through its precompiled relocation template when
+        it has one, and by walking its adjustments recursively otherwise.
+
+        Args:
+            updated_scripts: Set of script labels that have been updated
+        """
+        macros_to_adjust = self.config_manager.get_macros_to_adjust(src_file)
+        macro_info = self.find_macro(script["name"], macros_to_adjust, src_file)
+        if not macro_info:
+            return script["data"], []
+
+        adjustments = self._select_adjustments(script, macro_info)
+        if not adjustments:
+            return script["data"], []
+
+        template = self.relocation_compiler.get_template(script["name"], adjustments, src_file)
+        if template is not None:
+            lua_adjustments = self.relocation_compiler.apply(template, script, routines, new_script_labels, updated_scripts)
+            if lua_adjustments is not None:
+                return script["data"], lua_adjustments
+
+        return self._adjust_data_recursive(routines, script, src_file, new_script_labels, updated_scripts)
+
+    def _adjust_data_recursive(self, routines: Dict[str, RoutineData], script: ScriptParams,
                                src_file: str, new_script_labels: set, updated_scripts: set,
                                base_offset: int = 0) -> Tuple[bytearray, List[LuaAdjustment]]:
-        """Adjust script data based on macro definitions
+        """Adjust script data by walking macro definitions recursively
 
         Args:
             base_offset: Accumulated offset from parent macro calls
@@ -118,7 +168,11 @@ class MacroProcessor:
             if _name.startswith("0x"):
                 return script["data"], []
 
-            address = self.map_file_manager.get_sym_file_address(_name)
+            # New labels are looked up as labels, so they do not need the whole sym file
+            if _name in new_script_labels:
+                address = self.map_file_manager.get_label_address(_name)
+            else:
+                address = self.map_file_manager.get_sym_file_address(_name)
             if address is not None:
                 if "add" in info:
                     address += info["add"]
@@ -178,7 +232,7 @@ class MacroProcessor:
         macros_to_adjust = self.config_manager.get_macros_to_adjust(src_file)
 
         # Find matching macro (exact or regex)
-        macro_info = self._find_matching_macro(script["name"], macros_to_adjust)
+        macro_info = self.find_macro(script["name"], macros_to_adjust, src_file)
 
         lua_adjustments: List[LuaAdjustment] = []
 
@@ -186,16 +240,7 @@ class MacroProcessor:
             return script["data"], []
 
         # Determine which adjustments to apply
-        if isinstance(macro_info, dict) and ("$condition" in macro_info or "$if" in macro_info):
-            # Handle conditional macros
-            adjustments = self.conditional_processor.process_conditional_macro(script, macro_info)
-        elif isinstance(macro_info, list):
-            # Handle non-conditional macros (when macro_info is a list)
-            adjustments = macro_info
-        else:
-            # Exit with error
-            self.logger.log_message(f"[adjust_data_from_macro] Unknown macro_info type for {script['name']}: {macro_info}")
-            sys.exit(1)
+        adjustments = self._select_adjustments(script, macro_info)
 
         # Process all adjustments
         for info in adjustments:
@@ -217,7 +262,7 @@ class MacroProcessor:
                 accumulated_offset = base_offset + macro_offset
 
                 # Recursively process the macro with the accumulated offset
-                script["data"], _lua_adjustments = self.adjust_data_from_macro(routines, {
+                script["data"], _lua_adjustments = self._adjust_data_recursive(routines, {
                     "name": macro_name,
                     "params": params,
                     "data": script["data"],
@@ -0,0 +1,208 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+from .logger import Logger
+from .file_lock import file_lock
+from .porylive_types import GeneratedFileInfo, ManifestSource
+
+# Number of journal records appended before the journal is folded into the snapshot
+COMPACT_THRESHOLD = 32
+
+# Snapshot format version, used to tell it apart from the legacy {source: entries} layout
+MANIFEST_VERSION = 2
+
+class GeneratedFilesManifest:
+    """Tracks the generated files of every source with an append-only journal
+
+    porylive_generated_files.json holds a compacted snapshot and
+    porylive_generated_files.journal holds one JSON record per source update
+    since then. Each entry's Lua table fragment is rendered once, when the
+    entry is recorded, so rewriting porylive_generated_files.lua only costs
+    joining the stored fragments.
+    """
+
+    def __init__(self, logger: Logger, build_dir: Path):
+        self.logger = logger
+        self.json_path = build_dir / "porylive_generated_files.json"
+        self.journal_path = build_dir / "porylive_generated_files.journal"
+        self.lua_path = build_dir / "porylive_generated_files.lua"
+        self.lock_path = build_dir / "porylive_generated_files.lock"
+
+        self._sources: Dict[str, ManifestSource] = {}
+        self._journal_id: Optional[str] = None
+        self._journal_records = 0
+        self._loaded = False
+
+    @staticmethod
+    def render_entry(file_info: GeneratedFileInfo) -> str:
+        """Render the Lua table fragment for a single generated file"""
+        lines = [
+            "  {",
+            f"    label = \"{file_info['label']}\",",
+            f"    address = {file_info['address'] or 0},",
+            f"    filename = \"{file_info['filename']}\",",
+        ]
+        if 'lua_adjustments' in file_info.keys():
+            lines.append("    lua_adjustments = {")
+            for adjustment in file_info['lua_adjustments']:
+                lines.append("      {")
+                lines.append(f"        label = \"{adjustment['label']}\",")
+                lines.append(f"        offset = {adjustment['offset']},")
+                lines.append(f"        address_offset = {adjustment['address_offset']},")
+                lines.append("      },")
+            lines.append("    },")
+        lines.append("  },\n")
+        return "\n".join(lines)
+
+    def load(self):
+        """Load the snapshot and replay the journal on top of it"""
+        load_start = time.perf_counter()
+        self._sources = {}
+        self._journal_id = None
+        self._journal_records = 0
+
+        try:
+            with open(self.json_path, "r") as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            snapshot = None
+
+        if isinstance(snapshot, dict) and snapshot.get("version") == MANIFEST_VERSION:
+            self._sources = snapshot["sources"]
+            self._journal_id = snapshot["journal_id"]
+        elif isinstance(snapshot, dict):
+            # Legacy {source: entries} layout, render the fragments once
+            for source, entries in snapshot.items():
+                self._sources[source] = {
+                    'entries': entries,
+                    'fragments': [self.render_entry(entry) for entry in entries],
+                }
+
+        # The journal is only valid on top of the snapshot it was started from,
+        # otherwise the next update starts over with a fresh snapshot
+        if self._journal_id is not None and not self._replay_journal():
+            self._journal_id = None
+
+        self._loaded = True
+        load_end = time.perf_counter()
+        self.logger.log_profiling(f"Manifest load took {load_end - load_start:.4f}s, "
+                                  f"{self._journal_records} journal record(s)")
+
+    def _replay_journal(self) -> bool:
+        """Apply the journal records written since the last compaction, returning whether the journal is valid"""
+        try:
+            with open(self.journal_path, "r") as f:
+                lines = f.readlines()
+            header = json.loads(lines[0]) if lines else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+        if header.get('journal_id') != self._journal_id:
+            return False
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written trailing record, ignore it
+                break
+            self._sources[record['source']] = {
+                'entries': record['entries'],
+                'fragments': record['fragments'],
+            }
+            self._journal_records += 1
+        return True
+
+    @contextmanager
+    def locked(self) -> Iterator["GeneratedFilesManifest"]:
+        """Hold the manifest lock while updating it, starting from the latest files on disk
+
+        Every write goes through an atomic rename or a journal append, so
+        readers do not need the lock.
+        """
+        with file_lock(self.lock_path):
+            self._loaded = False
+            yield self
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    @property
+    def sources(self) -> Dict[str, ManifestSource]:
+        """Get the manifest data of every source"""
+        self._ensure_loaded()
+        return self._sources
+
+    def get_entries(self, source: str) -> List[GeneratedFileInfo]:
+        """Get the generated files recorded for a source"""
+        self._ensure_loaded()
+        source_data = self._sources.get(source)
+        return source_data['entries'] if source_data else []
+
+    def all_entries(self) -> List[GeneratedFileInfo]:
+        """Get the generated files of every source"""
+        self._ensure_loaded()
+        return [entry for source_data in self._sources.values() for entry in source_data['entries']]
+
+    def update_source(self, source: str, entries: List[GeneratedFileInfo]):
+        """Replace the generated files of a single source"""
+        update_start = time.perf_counter()
+        self._ensure_loaded()
+
+        source_data: ManifestSource = {
+            'entries': entries,
+            'fragments': [self.render_entry(entry) for entry in entries],
+        }
+        self._sources[source] = source_data
+
+        if self._journal_id is None or self._journal_records >= COMPACT_THRESHOLD:
+            self.compact()
+        else:
+            with open(self.journal_path, "a") as f:
+                f.write(json.dumps({'source': source, **source_data}) + "\n")
+            self._journal_records += 1
+
+        update_end = time.perf_counter()
+        self.logger.log_profiling(f"Manifest update took {update_end - update_start:.4f}s")
+
+    def compact(self):
+        """Fold the journal into a new snapshot and start an empty journal"""
+        compact_start = time.perf_counter()
+        self._ensure_loaded()
+
+        self._journal_id = os.urandom(16).hex()  # Random like uuid4, without importing uuid
+        _write_atomic(self.json_path, json.dumps({
+            'version': MANIFEST_VERSION,
+            'journal_id': self._journal_id,
+            'sources': self._sources,
+        }))
+        _write_atomic(self.journal_path, json.dumps({'journal_id': self._journal_id}) + "\n")
+        self._journal_records = 0
+
+        compact_end = time.perf_counter()
+        self.logger.log_profiling(f"Manifest compaction took {compact_end - compact_start:.4f}s")
+
+    def write_lua(self, excluded_labels: Optional[Set[str]] = None):
+        """Write porylive_generated_files.lua from the stored entry fragments, leaving out the excluded labels"""
+        lua_write_start = time.perf_counter()
+        self._ensure_loaded()
+
+        fragments = [fragment for source_data in self._sources.values()
+                     for entry, fragment in zip(source_data['entries'], source_data['fragments'])
+                     if not excluded_labels or entry['label'] not in excluded_labels]
+        _write_atomic(self.lua_path, "return {\n" + "".join(fragments) + "}\n")
+
+        lua_write_end = time.perf_counter()
+        self.logger.log_profiling(f"Lua file write took {lua_write_end - lua_write_start:.4f}s")
+        self.logger.log_message(f"Wrote porylive_generated_files.lua")
+
+def _write_atomic(path: Path, content: str):
+    """Write a text file through a temporary file and an atomic rename"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -1,17 +1,20 @@
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, Optional
 from .logger import Logger
 
+if TYPE_CHECKING:
+    from .label_index import LabelIndex
+
 class MapFileManager:
     """Handles sym file operations and address lookups"""
 
     def __init__(self, logger: Logger, project_dir: Path):
         self.logger = logger
         self.project_dir = project_dir
-        self._sym_file_lines: Optional[List[str]] = None
-        self._address_cache: Dict[str, int] = {}
+        self._symbol_index: Optional[Dict[str, int]] = None
         self._current_sym_file: Optional[Path] = None
+        self._label_index: Optional["LabelIndex"] = None
 
     def find_most_recent_sym_file(self) -> Path:
         """Find the most recently modified .sym file in the project directory"""
@@ -25,41 +28,67 @@ class MapFileManager:
         return most_recent
 
     def load_sym_file(self, sym_file_path: Optional[Path] = None):
-        """Load the sym file into memory"""
+        """Load the sym file into a symbol index"""
         if sym_file_path is None:
             sym_file_path = self.find_most_recent_sym_file()
 
         self._current_sym_file = sym_file_path
+        symbol_index: Dict[str, int] = {}
+
+        # Format: <hex_address> <g|l> <size> <symbol_name>
+        # The first occurrence of a symbol wins, matching a top-down scan
         with open(sym_file_path, "r") as f:
-            self._sym_file_lines = f.readlines()
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 4 and parts[3] not in symbol_index:
+                    symbol_index[parts[3]] = int(parts[0], 16)
+
+        self._symbol_index = symbol_index
+
+    def set_symbol_index(self, symbol_index: Dict[str, int], sym_file_path: Optional[Path] = None):
+        """Use an already loaded symbol index, e.g. one shared with a worker process"""
+        self._symbol_index = symbol_index
+        self._current_sym_file = sym_file_path
 
-        # Clear the cache when loading a new sym file
-        self._address_cache.clear()
+    def use_label_index(self, label_index: "LabelIndex"):
+        """Look addresses up in a loaded label index, only reading the sym file for symbols it does not have"""
+        self._label_index = label_index
+        self._symbol_index = None
+        self._current_sym_file = label_index.sym_file
 
     def get_sym_file_address(self, variable_name: str) -> Optional[int]:
         """Get the address of a variable from the sym file"""
-        if self._sym_file_lines is None:
-            self.load_sym_file()
+        if self._symbol_index is None:
+            if self._label_index is not None:
+                address = self._label_index.targets.get(variable_name)
+                if address is None:
+                    address = self._label_index.labels.get(variable_name)
+                if address is not None:
+                    return address
+            self.load_sym_file(self._current_sym_file)
+        return self._symbol_index.get(variable_name)
 
-        # Check cache first
-        if variable_name in self._address_cache:
-            return self._address_cache[variable_name]
+    def get_label_address(self, label: str) -> Optional[int]:
+        """Get the ROM address of a script label, or None if the label is new
 
-        # Search in sym file
-        # Format: <hex_address> <g|l> <size> <symbol_name>
-        for line in self._sym_file_lines:
-            parts = line.strip().split()
-            if len(parts) >= 4 and parts[3] == variable_name:
-                # Extract the address (first part, already in hex without 0x prefix)
-                address_hex = parts[0]
-                self._address_cache[variable_name] = int(address_hex, 16)
-                return self._address_cache[variable_name]
-
-        return None
-
-    def clear_cache(self):
-        """Clear the address cache"""
-        self._address_cache.clear()
+        With a label index, the original listings decide which labels are in
+        the ROM, so new labels never cause the sym file to be read.
+        """
+        if self._label_index is not None:
+            return self._label_index.labels.get(label)
+        return self.get_sym_file_address(label)
+
+    @property
+    def symbol_index(self) -> Dict[str, int]:
+        """Get the symbol index, loading the sym file if necessary"""
+        if self._symbol_index is None:
+            self.load_sym_file(self._current_sym_file)
+        return self._symbol_index
+
+    @property
+    def label_index(self) -> Optional["LabelIndex"]:
+        """Get the label index addresses are looked up in, if one is in use"""
+        return self._label_index
 
     @property
     def current_sym_file(self) -> Optional[Path]:
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from .artifact_store import ArtifactStore
+from .file_lock import file_lock
+from .logger import Logger
+from .porylive_types import SUPPORTED_FILES, GeneratedFileInfo, MemoSource
+
+# Bumped whenever the processing output changes for the same inputs
+MEMO_VERSION = 1
+
+# Directives that pull another file into an assembled source: gas .include and .incbin, and cpp's #include
+INCLUDE_PATTERN = re.compile(rb'^[ \t]*(?:\.include|\.incbin|#[ \t]*include)[ \t]+"([^"]+)"', re.MULTILINE)
+
+# Files whose include directives are followed, as opposed to e.g. .incbin data
+SCANNED_SUFFIXES = {".s", ".inc", ".h"}
+
+# Inputs outside the include graph, relative to the project directory
+EXTRA_INPUTS = ["charmap.txt"]
+
+class MemoCache:
+    """Maps the complete input state of a processing cycle to its finished results
+
+    Undo/redo and A/B tweaks bring the sources back to a state that was
+    already processed. The key hashes the contents of every file the
+    supported sources pull in, found by following their .include, .incbin
+    and #include directives, together with the original listings, the sym
+    file and the macro data. A repeat state restores its manifest entries,
+    routine binaries and rolling baseline without running make, the diff
+    or the parser.
+
+    File contents and their include directives are only read again when
+    their size or mtime changes.
+    Entries are evicted least recently used first once the cache grows
+    past its disk budget.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path, budget_bytes: int):
+        self.logger = logger
+        self.project_dir = project_dir
+        self.budget_bytes = budget_bytes
+
+        self.memo_dir = project_dir / ".porylive" / "memo"
+        self.blobs_dir = self.memo_dir / "blobs"
+        self.index_path = self.memo_dir / "index.json"
+        self.hashes_path = self.memo_dir / "input_hashes.json"
+        self.lock_path = self.memo_dir / "memo.lock"
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0
+
+    def _resolve_include(self, including_path: Path, name: str) -> Optional[Path]:
+        """Find an included file next to the including file, in the project directory or in include/"""
+        for directory in (including_path.parent, self.project_dir, self.project_dir / "include"):
+            path = Path(os.path.normpath(directory / name))
+            if path.is_file():
+                return path
+        return None
+
+    def _hash_inputs(self, roots: Iterable[Path],
+                     overrides: Optional[Dict[Path, bytes]] = None) -> List[Tuple[str, str]]:
+        """Hash the contents of files and of everything they include, reusing the hashes of files whose stat did not change
+
+        Files in overrides are hashed and scanned as if they contained the
+        given contents, e.g. an unsaved editor buffer, without touching the
+        cached hashes.
+        """
+        overrides = overrides or {}
+        try:
+            with open(self.hashes_path, "r") as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            cached = {}
+
+        def scan(path: Path, contents: bytes) -> List[str]:
+            if path.suffix not in SCANNED_SUFFIXES:
+                return []
+            return list(dict.fromkeys(match.decode("utf-8", "replace") for match in INCLUDE_PATTERN.findall(contents)))
+
+        hashes = {}
+        rehashed = 0
+        overridden = {}
+        pending = list(roots)
+        seen = set()
+        while pending:
+            path = pending.pop()
+            name = str(path)
+            if name in seen:
+                continue
+            seen.add(name)
+
+            if path in overrides:
+                overridden[name] = hashlib.blake2b(overrides[path], digest_size=16).hexdigest()
+                includes = scan(path, overrides[path])
+                if name in cached:
+                    hashes[name] = cached[name]
+            else:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entry = cached.get(name)
+                # Entries are [mtime_ns, size, digest, included names]
+                if entry is None or len(entry) != 4 or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                    with open(path, "rb") as f:
+                        contents = f.read()
+                    entry = [stat.st_mtime_ns, stat.st_size, hashlib.blake2b(contents, digest_size=16).hexdigest(),
+                             scan(path, contents)]
+                    rehashed += 1
+                hashes[name] = entry
+                includes = entry[3]
+
+            for include in includes:
+                included_path = self._resolve_include(path, include)
+                if included_path is not None:
+                    pending.append(included_path)
+
+        if rehashed or len(hashes) != len(cached):
+            self.memo_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.hashes_path.with_name(f".{self.hashes_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(hashes, f)
+            os.replace(tmp_path, self.hashes_path)
+
+        digests = {name: entry[2] for name, entry in hashes.items()}
+        digests.update(overridden)
+        return sorted(digests.items())
+
+    def compute_key(self, build_dir: Path, sym_file: Optional[Path], macro_data_file: Path, rolling: bool,
+                    overrides: Optional[Dict[Path, bytes]] = None) -> str:
+        """Hash everything the results of a cycle depend on, with the contents of overridden files replaced"""
+        key_start = time.perf_counter()
+        roots = [self.project_dir / path for path in SUPPORTED_FILES + EXTRA_INPUTS]
+        roots.append(macro_data_file)
+
+        # The original listings and the sym file only change with `make live`, so their stat is enough
+        versions = []
+        for path in sorted(build_dir.glob("data/*.lst")) + ([sym_file] if sym_file else []):
+            if path.name.endswith(".live.lst"):
+                continue
+            stat = path.stat()
+            versions.append([str(path), stat.st_mtime_ns, stat.st_size])
+
+        inputs = self._hash_inputs(roots, overrides)
+        key = hashlib.blake2b(json.dumps([
+            MEMO_VERSION,
+            rolling,
+            versions,
+            inputs,
+        ]).encode(), digest_size=16).hexdigest()
+
+        key_end = time.perf_counter()
+        self.logger.log_profiling(f"Memo key computation took {key_end - key_start:.4f}s, {len(inputs)} input(s)")
+        return key
+
+    def _entry_path(self, key: str) -> Path:
+        return self.memo_dir / f"{key}.json"
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'entries': {}, 'blobs': {}}
+
+    def _save_index(self, index: Dict):
+        tmp_path = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, key: str, sources: List[str], store: ArtifactStore) -> Optional[Dict[str, MemoSource]]:
+        """Look up the results of every source, restoring their binaries into the artifact store"""
+        if not self.enabled:
+            return None
+
+        with file_lock(self.lock_path):
+            try:
+                with open(self._entry_path(key), "r") as f:
+                    memo = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            if any(source not in memo for source in sources):
+                return None
+
+            restored: Dict[str, MemoSource] = {}
+            for source in sources:
+                entries: List[GeneratedFileInfo] = []
+                for entry in memo[source]['entries']:
+                    try:
+                        with open(self.blobs_dir / f"{entry['filename']}.bin", "rb") as f:
+                            output_path, _ = store.put(f.read())
+                    except FileNotFoundError:
+                        return None
+                    entries.append({**entry, 'filename': str(output_path)})
+                restored[source] = {'entries': entries, 'baseline': memo[source]['baseline']}
+
+            index = self._load_index()
+            if key in index['entries']:
+                index['entries'][key]['last_used'] = time.time()
+                # A speculative entry that was used is kept like any other
+                index['entries'][key].pop('speculative', None)
+                self._save_index(index)
+
+        return restored
+
+    def contains(self, key: str) -> bool:
+        """Check whether the results of an input state are cached"""
+        return self.enabled and self._entry_path(key).exists()
+
+    def put(self, key: str, results: Dict[str, MemoSource], speculative: bool = False) -> int:
+        """Remember the finished results of a cycle, then evict entries over the disk budget
+
+        Returns the number of bytes the entry takes, counting its blobs.
+        Speculative entries, processed from unsaved contents, can be
+        discarded again until a cycle uses them.
+        """
+        if not self.enabled:
+            return 0
+
+        put_start = time.perf_counter()
+        with file_lock(self.lock_path):
+            self.blobs_dir.mkdir(parents=True, exist_ok=True)
+            index = self._load_index()
+
+            memo = {}
+            digests = []
+            for source, result in results.items():
+                entries = []
+                for entry in result['entries']:
+                    # Blobs are shared between memo entries and named by their digest, like the artifact store
+                    blob_path = Path(entry['filename'])
+                    digest = blob_path.stem
+                    memo_blob_path = self.blobs_dir / blob_path.name
+                    if digest not in index['blobs']:
+                        try:
+                            os.link(blob_path, memo_blob_path)
+                        except FileExistsError:
+                            pass
+                        except OSError:
+                            shutil.copyfile(blob_path, memo_blob_path)
+                        index['blobs'][digest] = memo_blob_path.stat().st_size
+                    digests.append(digest)
+                    entries.append({**entry, 'filename': digest})
+                memo[source] = {'entries': entries, 'baseline': result['baseline']}
+
+            content = json.dumps(memo)
+            with open(self._entry_path(key), "w") as f:
+                f.write(content)
+            index['entries'][key] = {
+                'last_used': time.time(),
+                'size': len(content),
+                'blobs': sorted(set(digests)),
+            }
+            if speculative:
+                index['entries'][key]['speculative'] = True
+            size = len(content) + sum(index['blobs'][digest] for digest in set(digests))
+
+            self._evict(index)
+            self._save_index(index)
+
+        put_end = time.perf_counter()
+        self.logger.log_profiling(f"Memo store took {put_end - put_start:.4f}s")
+        return size
+
+    def discard(self, key: str) -> bool:
+        """Remove a speculative entry that no cycle has used, returning whether it was removed"""
+        with file_lock(self.lock_path):
+            index = self._load_index()
+            if not index['entries'].get(key, {}).get('speculative'):
+                return False
+            self._remove_entry(index, key)
+            self._save_index(index)
+        return True
+
+    def _remove_entry(self, index: Dict, key: str):
+        """Remove an entry, then the blobs no other entry references"""
+        del index['entries'][key]
+        try:
+            self._entry_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+        referenced = {digest for entry in index['entries'].values() for digest in entry['blobs']}
+        for digest in [digest for digest in index['blobs'] if digest not in referenced]:
+            del index['blobs'][digest]
+            try:
+                (self.blobs_dir / f"{digest}.bin").unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, index: Dict):
+        """Drop least recently used entries until the cache fits its budget, then their orphaned blobs"""
+        def total_size() -> int:
+            return sum(entry['size'] for entry in index['entries'].values()) + sum(index['blobs'].values())
+
+        evicted = 0
+        by_last_used = sorted(index['entries'].items(), key=lambda item: item[1]['last_used'])
+        for key, _ in by_last_used[:-1]:
+            if total_size() <= self.budget_bytes:
+                break
+            self._remove_entry(index, key)
+            evicted += 1
+
+        if evicted:
+            self.logger.log_profiling(f"Evicted {evicted} memo entries")
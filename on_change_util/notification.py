@@ -1,37 +1,137 @@
 import socket
+import threading
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
 from .logger import Logger
 
+# Port porylive.lua listens on, or the first one it tries when several instances are running
+DEFAULT_PORT = 1370
+
+# Seconds to wait for porylive.lua to acknowledge RELOAD, which it does once applied
+ACK_TIMEOUT = 2.0
+
+class Delivery(NamedTuple):
+    """How a notification reached one porylive.lua instance"""
+    host: str
+    port: int
+    sent: bool
+    send_time: float  # Seconds to connect and send
+    ack_time: Optional[float]  # Seconds until acknowledged, None if porylive.lua did not acknowledge it
+
 class NotificationManager:
-    """Handles socket communication with porylive.lua"""
+    """Handles socket communication with porylive.lua
 
-    def __init__(self, logger: Logger, host: str = 'localhost', port: int = 1370):
+    Every running porylive.lua writes build/porylive_endpoint_<port>.txt when
+    it starts listening, so notifications are broadcast to all of them, along
+    with the endpoints configured in PORYLIVE_ENDPOINTS. Without either, the
+    default port is used.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Optional[Path] = None,
+                 configured_endpoints: Optional[List[Tuple[str, int]]] = None,
+                 host: str = 'localhost', port: int = DEFAULT_PORT):
         self.logger = logger
+        self.project_dir = project_dir
+        self.configured_endpoints = configured_endpoints or []
         self.host = host
         self.port = port
 
-    def send_notification(self, message: str):
-        """Send a reload notification to porylive.lua via socket"""
+        # Deliveries of the last notification, e.g. for benchmarks
+        self.last_deliveries: List[Delivery] = []
+
+    def announcement_paths(self) -> List[Path]:
+        """Find the endpoints announced by running porylive.lua instances"""
+        if self.project_dir is None:
+            return []
+        return sorted((self.project_dir / "build").glob("porylive_endpoint_*.txt"))
+
+    def get_endpoints(self) -> List[Tuple[str, int]]:
+        """Get every porylive.lua instance to notify, without duplicates"""
+        endpoints = list(self.configured_endpoints)
+        for path in self.announcement_paths():
+            try:
+                endpoints.append(('localhost', int(path.read_text().strip())))
+            except (OSError, ValueError):
+                continue
+        if not endpoints:
+            endpoints.append((self.host, self.port))
+        return list(dict.fromkeys(endpoints))
+
+    def deliver(self, host: str, port: int, message: str, wait_for_ack: bool) -> Delivery:
+        """Send a notification to one porylive.lua instance, optionally waiting for its acknowledgement"""
+        send_start = time.perf_counter()
+        # 2 second timeout
+        with socket.create_connection((host, port), timeout=2.0) as sock:
+            sock.sendall(message.encode('utf-8'))
+            send_time = time.perf_counter() - send_start
+            ack_time = None
+            if wait_for_ack:
+                sock.settimeout(ACK_TIMEOUT)
+                try:
+                    # porylive.lua versions without acknowledgements close the socket instead
+                    if sock.recv(1024).decode('utf-8', 'replace').strip() == f"ACK {message}":
+                        ack_time = time.perf_counter() - send_start
+                except (socket.timeout, ConnectionResetError):
+                    pass
+        return Delivery(host, port, True, send_time, ack_time)
+
+    def notify(self, host: str, port: int, message: str, wait_for_ack: bool) -> Delivery:
+        """Deliver a notification to one instance, logging how it went"""
+        endpoint = f"{host}:{port}"
         try:
-            # Try to connect to the Lua script on localhost:1370
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2.0)  # 2 second timeout
-            sock.connect((self.host, self.port))
-            sock.send(message.encode('utf-8'))
-            sock.close()
-            self.logger.log_message(f"Sent notification to porylive.lua: {message}")
+            delivery = self.deliver(host, port, message, wait_for_ack)
         except socket.timeout:
-            self.logger.log_message(f"Failed to send notification to porylive.lua: {message}",
+            self.logger.log_message(f"Failed to send notification to porylive.lua at {endpoint}: {message}",
                         "Timeout connecting to porylive.lua - make sure mGBA is running with porylive.lua loaded")
         except ConnectionRefusedError:
-            self.logger.log_message(f"Failed to send notification to porylive.lua: {message}",
+            self.logger.log_message(f"Failed to send notification to porylive.lua at {endpoint}: {message}",
                         "Connection refused - see tools/porylive/README.md for setup instructions")
+            self.forget_endpoint(port)
         except Exception as e:
-            self.logger.log_message(f"Failed to send notification to porylive.lua: {e}")
+            self.logger.log_message(f"Failed to send notification to porylive.lua at {endpoint}: {e}")
+        else:
+            if not wait_for_ack:
+                timing = f"sent in {delivery.send_time * 1000:.1f}ms"
+            elif delivery.ack_time is None:
+                timing = f"sent in {delivery.send_time * 1000:.1f}ms, not acknowledged"
+            else:
+                timing = (f"sent in {delivery.send_time * 1000:.1f}ms, "
+                          f"acknowledged in {delivery.ack_time * 1000:.1f}ms")
+            self.logger.log_message(f"Sent notification to porylive.lua at {endpoint}: {message} ({timing})")
+            return delivery
+        return Delivery(host, port, False, 0.0, None)
+
+    def forget_endpoint(self, port: int):
+        """Remove the announcement of an instance that is no longer listening, e.g. a closed mGBA window"""
+        for path in self.announcement_paths():
+            try:
+                if int(path.read_text().strip()) == port:
+                    path.unlink()
+            except (OSError, ValueError):
+                continue
+
+    def send_notification(self, message: str, wait_for_ack: bool = False) -> List[Delivery]:
+        """Send a notification to every porylive.lua instance via socket, all at once"""
+        endpoints = self.get_endpoints()
+        if len(endpoints) == 1:
+            deliveries = [self.notify(*endpoints[0], message, wait_for_ack)]
+        else:
+            deliveries: List[Optional[Delivery]] = [None] * len(endpoints)
+            def notify_endpoint(index: int):
+                deliveries[index] = self.notify(*endpoints[index], message, wait_for_ack)
+            threads = [threading.Thread(target=notify_endpoint, args=(index,)) for index in range(len(endpoints))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.last_deliveries = deliveries
+        return deliveries
 
     def send_processing(self):
-        """Send PROCESSING notification"""
+        """Send PROCESSING notification, which porylive.lua does not acknowledge"""
         self.send_notification("PROCESSING")
 
     def send_reload(self):
-        """Send RELOAD notification"""
-        self.send_notification("RELOAD")
+        """Send RELOAD notification, waiting until every instance applied it"""
+        self.send_notification("RELOAD", wait_for_ack=True)
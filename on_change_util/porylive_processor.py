@@ -1,17 +1,31 @@
+import os
 import sys
 import time
+from functools import cached_property
 from pathlib import Path
-from typing import Optional, Set
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 from .logger import Logger
 from .config import ConfigManager
-from .map_file import MapFileManager
-from .build_manager import BuildManager
-from .script_differ import ScriptDiffer
-from .macro_processor import MacroProcessor
-from .lst_parser import LSTParser
-from .file_manager import FileManager
-from .notification import NotificationManager
-from .porylive_types import SUPPORTED_FILES
+from .artifact_store import ArtifactStore
+from .manifest import GeneratedFilesManifest
+from .scheduler import CycleCancelled, Scheduler
+from .workers import process_sources_parallel
+from .porylive_types import SUPPORTED_FILES, GeneratedFileInfo, MemoSource, SourceResult
+
+if TYPE_CHECKING:
+    from .map_file import MapFileManager
+    from .build_manager import BuildManager
+    from .script_differ import ScriptDiffer
+    from .macro_processor import MacroProcessor
+    from .lst_parser import LSTParser
+    from .file_manager import FileManager
+    from .baseline import BaselineStore
+    from .memo_cache import MemoCache
+    from .recorder import SessionRecorder
+    from .poryscript_cache import PoryscriptCache
+    from .notification import NotificationManager
+    from .speculation import SpeculationServer
+    from .capacity import CapacityManager
 
 class PoryliveProcessor:
     """Main processor that orchestrates all porylive operations"""
@@ -20,15 +34,74 @@ class PoryliveProcessor:
         # Initialize logger first
         self.logger = Logger(project_dir, profiling)
 
-        # Initialize all components
+        # Other components are created, and their modules imported, on first use,
+        # so saves that are skipped early do not pay for the whole pipeline
         self.config_manager = ConfigManager(project_dir, porylive_dir, self.logger)
-        self.map_file_manager = MapFileManager(self.logger, self.config_manager.project_dir)
-        self.build_manager = BuildManager(self.logger, self.config_manager.project_dir)
-        self.script_differ = ScriptDiffer(self.logger, self.config_manager)
-        self.macro_processor = MacroProcessor(self.logger, self.config_manager, self.map_file_manager)
-        self.lst_parser = LSTParser(self.logger, self.map_file_manager, self.macro_processor)
-        self.file_manager = FileManager(self.logger)
-        self.notification_manager = NotificationManager(self.logger)
+
+        # Seconds spent in each stage of the last processed cycle, e.g. for benchmarks
+        self.timings: Dict[str, float] = {}
+
+    @cached_property
+    def map_file_manager(self) -> "MapFileManager":
+        from .map_file import MapFileManager
+        return MapFileManager(self.logger, self.config_manager.project_dir)
+
+    @cached_property
+    def build_manager(self) -> "BuildManager":
+        from .build_manager import BuildManager
+        return BuildManager(self.logger, self.config_manager.project_dir)
+
+    @cached_property
+    def script_differ(self) -> "ScriptDiffer":
+        from .script_differ import ScriptDiffer
+        return ScriptDiffer(self.logger, self.config_manager)
+
+    @cached_property
+    def macro_processor(self) -> "MacroProcessor":
+        from .macro_processor import MacroProcessor
+        return MacroProcessor(self.logger, self.config_manager, self.map_file_manager)
+
+    @cached_property
+    def lst_parser(self) -> "LSTParser":
+        from .lst_parser import LSTParser
+        return LSTParser(self.logger, self.map_file_manager, self.macro_processor)
+
+    @cached_property
+    def file_manager(self) -> "FileManager":
+        from .file_manager import FileManager
+        return FileManager(self.logger)
+
+    @cached_property
+    def notification_manager(self) -> "NotificationManager":
+        from .notification import NotificationManager
+        return NotificationManager(self.logger, self.config_manager.project_dir,
+                                   self.config_manager.configured_endpoints)
+
+    @cached_property
+    def baseline_store(self) -> "BaselineStore":
+        from .baseline import BaselineStore
+        return BaselineStore(self.logger, self.config_manager.project_dir)
+
+    @cached_property
+    def memo_cache(self) -> "MemoCache":
+        from .memo_cache import MemoCache
+        return MemoCache(self.logger, self.config_manager.project_dir, self.config_manager.memo_budget_bytes)
+
+    @cached_property
+    def session_recorder(self) -> "SessionRecorder":
+        from .recorder import SessionRecorder
+        return SessionRecorder(self.logger, self.config_manager.project_dir)
+
+    @cached_property
+    def poryscript_cache(self) -> "PoryscriptCache":
+        from .poryscript_cache import PoryscriptCache
+        return PoryscriptCache(self.logger, self.config_manager.project_dir)
+
+    @cached_property
+    def capacity_manager(self) -> "CapacityManager":
+        from .capacity import CapacityManager
+        return CapacityManager(self.logger, self.config_manager.build_dir, self.config_manager.script_buffer_size,
+                               self.config_manager.script_overrides_size)
 
     def determine_selected_file(self, updated_file: Optional[str]) -> Optional[str]:
         """Determine which supported file to process based on the updated file"""
@@ -54,107 +127,481 @@ class PoryliveProcessor:
             return False
         return True
 
+    def load_symbols(self):
+        """Look addresses up in the label index built by `make live`, or in the sym file if it is missing or stale"""
+        from .label_index import LabelIndex
+        label_index = LabelIndex(self.logger, self.config_manager.build_dir)
+        if label_index.load():
+            self.map_file_manager.use_label_index(label_index)
+        else:
+            self.logger.log_profiling("Label index is missing or stale, reading the sym file")
+            self.map_file_manager.load_sym_file()
+
+    def determine_selected_files(self, updated_files: List[str]) -> List[str]:
+        """Determine which supported files to process, in the order they were first affected"""
+        selected_files = []
+        for updated_file in updated_files:
+            selected_file = self.determine_selected_file(updated_file)
+            if selected_file and selected_file not in selected_files:
+                selected_files.append(selected_file)
+        return selected_files
+
+    def get_lst_paths(self, selected_file: str, live_build_dir: Optional[Path] = None) -> Tuple[Path, Path]:
+        """Get the original and live .lst paths of a supported file, the live one from live_build_dir if given"""
+        # Generate .lst file paths by replacing .s with .live.lst and .o.lst
+        base_path = str(selected_file).replace('.s', '')
+        build_dir = self.config_manager.build_dir
+        return build_dir / (base_path + '.lst'), (live_build_dir or build_dir) / (base_path + '.live.lst')
+
+    def filter_modified_files(self, updated_files: List[str]) -> List[str]:
+        """Keep only files modified since their source was last assembled by `make live`
+
+        Watchman lists every matching file on its initial trigger, right after
+        `make live`, while a branch switch lists files that are newer than the
+        original listings.
+        """
+        modified_files = []
+        skipped_files = []
+        for updated_file in updated_files:
+            # .pory files are compiled into .inc files included by event_scripts.s
+            selected_file = ('data/event_scripts.s' if updated_file.endswith('.pory')
+                             else self.determine_selected_file(updated_file))
+            if selected_file:
+                src_lst_old, _ = self.get_lst_paths(selected_file)
+                try:
+                    if (self.config_manager.project_dir / updated_file).stat().st_mtime > src_lst_old.stat().st_mtime:
+                        modified_files.append(updated_file)
+                        continue
+                except FileNotFoundError:
+                    pass
+            skipped_files.append(updated_file)
+
+        if skipped_files:
+            self.logger.log_message(f"Skipping {len(skipped_files)} file(s) not modified since make live")
+        return modified_files
+
     def process_file(self, updated_file: Optional[str]) -> bool:
         """Process a single file update"""
+        return self.process_files([updated_file] if updated_file else [])
+
+    def process_files(self, updated_files: List[str], initial_trigger: bool = True) -> bool:
+        """Process the files reported by a single trigger, unless a newer save supersedes it
+
+        initial_trigger is False for sources that never list unchanged files,
+        like the built-in watcher, so their batches are not filtered.
+        """
         main_start = time.perf_counter()
         self.logger.log_profiling("Starting main function")
+        self.timings = {}
 
-        # Skip initial watchman trigger
-        if len(sys.argv) > 2:
+        # Load configuration
+        self.config_manager.load_porylive_config()
+
+        # Skip the trigger of .inc files written from .pory files, which were already processed
+        if updated_files:
+            updated_files = self.poryscript_cache.drop_generated(updated_files)
+            if not updated_files:
+                self.logger.log_message("Skipping .inc files generated by porylive from .pory files")
+                return True
+
+        # Skip the initial watchman trigger, but keep files changed by e.g. a branch switch
+        if initial_trigger and len(updated_files) > 1:
+            updated_files = self.filter_modified_files(updated_files)
+            if not updated_files:
+                return True
+
+        scheduler = Scheduler(self.logger, self.config_manager.project_dir, self.config_manager.debounce_seconds)
+        scheduler.register(updated_files)
+        try:
+            scheduler.wait_debounce()
+            with scheduler.pipeline():
+                # Also process the files of every save this one superseded
+                updated_files = scheduler.claim_pending()
+                try:
+                    success = self.run_cycle(updated_files, scheduler)
+                finally:
+                    # A superseded cycle leaves its files to the newer one
+                    if scheduler.is_current():
+                        scheduler.complete()
+        except CycleCancelled as e:
+            self.logger.log_message(f"Skipping changes superseded by a newer save ({e})")
             return True
 
+        main_end = time.perf_counter()
+        total_main_time = main_end - main_start
+        self.logger.log_profiling(f"main function total time: {total_main_time:.4f}s")
+        self.timings['total'] = total_main_time
+
+        return success
+
+    def watch(self, watchman_json_path: Path):
+        """Process saves reported by the built-in watcher, until interrupted
+
+        Changes are queued in-process instead of spawning a process per save.
+        A change stops the running cycle right away, and the files that
+        arrive until the queue is quiet for the coalescing window are
+        processed together.
+        """
+        import queue
+        from .watcher import FileWatcher, coalesce, load_watch_patterns
+
+        # Coalescing replaces the debounce between separate invocations
+        os.environ.setdefault("PORYLIVE_DEBOUNCE_MS", "0")
+
+        project_dir = self.config_manager.project_dir
+        changes: "queue.Queue[List[str]]" = queue.Queue()
+        scheduler = Scheduler(self.logger, project_dir, 0)
+
+        def on_change(changed_files: List[str]):
+            # Skip .inc files this process just wrote from .pory files
+            changed_files = [changed_file for changed_file in changed_files
+                             if not self.poryscript_cache.is_generated(changed_file)]
+            if changed_files:
+                scheduler.supersede()
+                changes.put(changed_files)
+
+        watcher = FileWatcher(self.logger, project_dir, load_watch_patterns(watchman_json_path),
+                              self.config_manager.watch_poll_seconds, self.config_manager.force_polling)
+        watcher.start(on_change)
+        self.logger.log_message(f"Watching {', '.join(watcher.roots)} for changes ({watcher.backend})")
+        print(f"[+] Porylive is watching {project_dir} for changes ({watcher.backend}), press Ctrl+C to stop")
+        speculation_server = self.start_speculation()
+
+        try:
+            while True:
+                updated_files = coalesce(changes, self.config_manager.coalesce_seconds)
+                try:
+                    # The watcher only reports saves, there is no initial trigger to skip
+                    self.process_files(updated_files, initial_trigger=False)
+                except SystemExit:
+                    # Errors were logged, keep watching for the save that fixes them
+                    pass
+                except Exception as e:
+                    self.logger.log_message(f"Error: {e}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.stop()
+            if speculation_server is not None:
+                speculation_server.stop()
+
+    def start_speculation(self) -> Optional["SpeculationServer"]:
+        """Start processing unsaved editor buffers in the background, unless it is disabled"""
+        port = self.config_manager.speculate_port
+        if not port:
+            return None
+        from .speculation import SpeculationServer
+
+        # Speculative cycles run on their own components, next to the saved ones
+        speculator = PoryliveProcessor(self.config_manager.project_dir, self.config_manager.porylive_dir,
+                                       self.logger.profiling)
+        speculator.logger.prefix = "[SPECULATIVE] "
+        server = SpeculationServer(self.logger, speculator, port, self.config_manager.speculate_budget_bytes)
+        server.start()
+        print(f"[+] Porylive is listening for unsaved changes on port {port}")
+        return server
+
+    def serve_speculation(self):
+        """Process unsaved editor buffers until interrupted, for when saves are processed by watchman"""
+        server = self.start_speculation()
+        if server is None:
+            self.logger.log_message("Speculative processing is disabled, PORYLIVE_SPECULATE_PORT is 0")
+            return
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+
+    def speculate(self, updated_file: str, contents: bytes, scheduler: Scheduler) -> Optional[Tuple[str, int]]:
+        """Process the unsaved contents of a file ahead of its save, returning the memo key and size of the results
+
+        The contents are assembled in a shadow tree of the project, so
+        nothing the running game or a saved cycle uses is touched. The
+        results are stored in the memo cache under the key the input state
+        will have once the file is saved with these contents, so that save
+        injects them right away. The work stops as soon as a save arrives.
+        """
+        from .speculation import ShadowTree
+
+        # A rolling baseline depends on the order saves are injected in, which is unknown ahead of a save
+        if self.config_manager.rolling_baseline or not self.memo_cache.enabled:
+            return None
+        selected_files = self.determine_selected_files([updated_file])
+        if not selected_files or not self.validate_build_environment():
+            return None
+
+        self.load_symbols()
+        project_dir = self.config_manager.project_dir
+        memo_key = self.compute_memo_key({project_dir / updated_file: contents})
+        if self.memo_cache.contains(memo_key):
+            self.logger.log_profiling(f"Speculative state of {updated_file} was already processed")
+            return memo_key, 0
+
+        speculate_start = time.perf_counter()
+        build_dir = self.config_manager.build_dir
+        shadow_tree = ShadowTree(self.logger, project_dir, project_dir / ".porylive" / "speculative")
+        shadow_dir = shadow_tree.build({updated_file: contents}, [build_dir.relative_to(project_dir) / "data"])
+
+        with scheduler.pipeline():
+            self.build_manager.run_make_live_update(build_dir, lambda: not scheduler.is_current(), shadow_dir)
+            scheduler.check("speculative processing")
+
+            artifact_store = ArtifactStore(self.logger, shadow_tree.objects_dir)
+            results: Dict[str, MemoSource] = {}
+            for source in selected_files:
+                result = self.process_source(source, shadow_dir / build_dir.relative_to(project_dir))
+                entries = self.file_manager.write_binary_files(result['routines'], artifact_store, source)
+                results[source] = {'entries': entries, 'baseline': None}
+
+            # The inputs may have been saved differently while they were processed
+            scheduler.check("storing speculative results")
+            size = self.memo_cache.put(memo_key, results, speculative=True)
+
+        speculate_end = time.perf_counter()
+        self.logger.log_profiling(f"Speculative processing of {updated_file} took {speculate_end - speculate_start:.4f}s")
+        return memo_key, size
+
+    def run_cycle(self, updated_files: List[str], scheduler: Scheduler) -> bool:
+        """Rebuild the listings and inject every changed script, checking for newer saves between stages"""
         # Write arguments to log
         _args = ["Script invoked with arguments:"]
         for i, arg in enumerate(sys.argv):
             _args.append(f"  argv[{i}]: {arg}")
         self.logger.log_message(*_args)
 
-        # Load configuration
-        self.config_manager.load_porylive_config()
-
-        # If the file ends with .pory, try to process it with poryscript
-        if updated_file and updated_file.endswith('.pory'):
-            self.build_manager.try_process_poryscript_file(self.config_manager.project_dir / updated_file)
-            return True
-
-        # Load map file
-        self.map_file_manager.load_sym_file()
+        # If the file ends with .pory, process it with poryscript and continue with the .inc file it generates
+        updated_files = list(dict.fromkeys(
+            self.build_manager.try_process_poryscript_file(updated_file, self.poryscript_cache)
+            if updated_file.endswith('.pory') else updated_file
+            for updated_file in updated_files
+        ))
 
-        # Determine which supported file to process
-        selected_file = self.determine_selected_file(updated_file)
+        # Determine which supported files to process
+        selected_files = self.determine_selected_files(updated_files)
 
         # Exit early if no matching file found
-        if not selected_file:
-            self.logger.log_message(f"File not supported with porylive: {updated_file}")
+        if not selected_files:
+            self.logger.log_message(f"File not supported with porylive: {' '.join(updated_files)}")
             return False
 
         # Validate build environment
         if not self.validate_build_environment():
             return False
 
-        self.notification_manager.send_processing()
+        # Load symbol addresses
+        self.load_symbols()
 
-        # Set up file paths based on selected file
-        # Generate .lst file paths by replacing .s with .live.lst and .o.lst
-        base_path = str(selected_file).replace('.s', '')
+        # Reuse the results of an input state that was already processed
         build_dir = self.config_manager.build_dir
-        src_lst_live = build_dir / (base_path + '.live.lst')
-        src_lst_old = build_dir / (base_path + '.lst')
+        artifact_store = ArtifactStore(self.logger, build_dir / "bin" / "objects")
+        memo_start = time.perf_counter()
+        memo_key = self.compute_memo_key() if self.memo_cache.enabled else None
+        results = self.restore_memoized_results(memo_key, selected_files, artifact_store) if memo_key else None
+        memo_hit = results is not None
+        self.timings['memo'] = time.perf_counter() - memo_start
+
+        scheduler.check("make live-update")
+        self.notification_manager.send_processing()
+
+        if not memo_hit:
+            # Run make live-update, which assembles every supported source at once
+            make_start = time.perf_counter()
+            self.build_manager.run_make_live_update(build_dir, lambda: not scheduler.is_current())
+            make_end = time.perf_counter()
+            self.logger.log_profiling(f"make live-update took {make_end - make_start:.4f}s")
+            self.timings['make'] = make_end - make_start
+
+            # Run the pipeline for each source, in parallel when there is more than one
+            scheduler.check("processing")
+            process_start = time.perf_counter()
+            if len(selected_files) > 1:
+                results = process_sources_parallel(self, selected_files)
+            else:
+                results = [self.process_source(selected_files[0])]
+            self.timings['process'] = time.perf_counter() - process_start
 
-        # Run make live-update
-        make_start = time.perf_counter()
-        self.build_manager.run_make_live_update(build_dir)
-        make_end = time.perf_counter()
-        self.logger.log_profiling(f"make live-update took {make_end - make_start:.4f}s")
+        # Nothing has been written yet, so a newer save can still take over cleanly
+        scheduler.check("writing generated files")
+
+        # Store binary files, only writing the ones whose contents changed
+        write_start = time.perf_counter()
+        recording = self.config_manager.record_sessions and not memo_hit
+        with GeneratedFilesManifest(self.logger, build_dir).locked() as manifest:
+            previous_entries = {result['source']: manifest.get_entries(result['source'])
+                                for result in results} if recording else {}
+            for result in results:
+                file_infos = self.file_manager.write_binary_files(result['routines'], artifact_store, result['source'])
+                file_infos = result['carried_entries'] + file_infos
+
+                # Record this source's generated files
+                manifest.update_source(result['source'], file_infos)
+
+            # Write the Lua file list once for every source, leaving out the least
+            # recently edited scripts when they do not all fit in the game's script memory
+            original_listings = [self.get_lst_paths(source)[0] for source in SUPPORTED_FILES]
+            manifest.write_lua(self.capacity_manager.select(manifest.all_entries(), original_listings))
+
+            # Remove binaries no longer referenced by any source
+            artifact_store.collect_garbage(file_info['filename'] for file_info in manifest.all_entries())
+        self.timings['write'] = time.perf_counter() - write_start
+
+        self.notification_manager.send_reload()
+
+        # Record the cycle before its baseline replaces the one it started from
+        if recording:
+            self.record_cycle(updated_files, selected_files, previous_entries, manifest)
+
+        # The injected state is now the baseline the next save is diffed against
+        if self.config_manager.rolling_baseline:
+            for result in results:
+                self.baseline_store.commit(result['source'])
+
+        # Remember the results, unless the inputs changed while they were processed
+        if memo_key and not memo_hit and memo_key == self.compute_memo_key():
+            self.memo_cache.put(memo_key, {
+                source: {
+                    'entries': manifest.get_entries(source),
+                    'baseline': self.baseline_store.export(source) if self.config_manager.rolling_baseline else None,
+                }
+                for source in selected_files
+            })
+
+        return True
+
+    def record_cycle(self, updated_files: List[str], selected_files: List[str],
+                     previous_entries: Dict[str, List[GeneratedFileInfo]], manifest: GeneratedFilesManifest):
+        """Append the inputs and outputs of this cycle to the current session archive"""
+        rolling_baseline = self.config_manager.rolling_baseline
+        sources = {}
+        for source in selected_files:
+            src_lst_old, src_lst_live = self.get_lst_paths(source)
+            sources[source] = {
+                'old_listing': src_lst_old,
+                'new_listing': src_lst_live,
+                'baseline': self.baseline_store.export(source) if rolling_baseline else None,
+                'previous_entries': previous_entries.get(source, []) if rolling_baseline else [],
+                'outputs': manifest.get_entries(source),
+            }
+
+        sym_file = self.map_file_manager.current_sym_file
+        session_name = self.session_recorder.session_name(
+            [self.get_lst_paths(source)[0] for source in SUPPORTED_FILES], sym_file)
+        self.session_recorder.record_cycle(session_name, updated_files, sources, sym_file,
+                                           self.config_manager.macro_data_file, rolling_baseline, self.timings)
+
+    def compute_memo_key(self, overrides: Optional[Dict[Path, bytes]] = None) -> str:
+        """Get the memo cache key of the current input state, or of the state once overrides are saved"""
+        return self.memo_cache.compute_key(
+            self.config_manager.build_dir,
+            self.map_file_manager.current_sym_file,
+            self.config_manager.macro_data_file,
+            self.config_manager.rolling_baseline,
+            overrides,
+        )
+
+    def restore_memoized_results(self, memo_key: str, selected_files: List[str],
+                                 artifact_store: ArtifactStore) -> Optional[List[SourceResult]]:
+        """Get the results of every selected source from the memo cache, if they are all there"""
+        memo = self.memo_cache.get(memo_key, selected_files, artifact_store)
+        if memo is None:
+            return None
+
+        rolling_baseline = self.config_manager.rolling_baseline
+        if rolling_baseline and any(memo[source]['baseline'] is None for source in selected_files):
+            return None
+
+        results: List[SourceResult] = []
+        for source in selected_files:
+            if rolling_baseline:
+                self.baseline_store.restore(source, memo[source]['baseline'])
+            results.append({'source': source, 'routines': {}, 'carried_entries': memo[source]['entries']})
+
+        self.logger.log_message(f"Reusing the results of an already processed state of {' '.join(selected_files)}")
+        return results
+
+    def process_source(self, selected_file: str, live_build_dir: Optional[Path] = None) -> SourceResult:
+        """Diff, parse and macro-adjust the listing of one supported file"""
+        source_start = time.perf_counter()
+        src_lst_old, src_lst_live = self.get_lst_paths(selected_file, live_build_dir)
+
+        # In rolling baseline mode, diff against the last injected state of this source
+        baseline = None
+        if self.config_manager.rolling_baseline:
+            baseline = self.baseline_store.load(selected_file, src_lst_old)
 
         # Get updated scripts
         scripts_start = time.perf_counter()
-        updated_scripts, needs_macro_adjustment = self.script_differ.get_updated_scripts(src_lst_old, src_lst_live, selected_file)
+        self.script_differ.reset()
+        old_stripped = None
+        if baseline:
+            old_stripped, baseline_new_labels = baseline
+            self.script_differ.new_script_labels.update(baseline_new_labels)
+        updated_scripts, needs_macro_adjustment = self.script_differ.get_updated_scripts(
+            src_lst_old, src_lst_live, selected_file, old_stripped)
         scripts_end = time.perf_counter()
         self.logger.log_profiling(f"get_updated_scripts took {scripts_end - scripts_start:.4f}s")
+        self.timings['diff'] = scripts_end - scripts_start
+
+        # Keep the entries of earlier saves that this save did not touch
+        carried_entries = []
+        if self.config_manager.rolling_baseline:
+            live_labels = self.rebase_new_labels()
+            manifest = GeneratedFilesManifest(self.logger, self.config_manager.build_dir)
+            carried_entries = [entry for entry in manifest.get_entries(selected_file)
+                               if entry['label'] in live_labels and entry['label'] not in updated_scripts]
+        carried_labels = {entry['label'] for entry in carried_entries}
 
         global_state = self.script_differ.global_state
 
         if len(global_state['new_script_labels']) > 0:
-            self.logger.log_message(f"Found {len(updated_scripts)} updated script(s) and {len(global_state['new_script_labels'])} new script(s)")
+            self.logger.log_message(f"Found {len(updated_scripts)} updated script(s) and {len(global_state['new_script_labels'])} new script(s) in {selected_file}")
         else:
-            self.logger.log_message(f"Found {len(updated_scripts)} updated script(s)")
+            self.logger.log_message(f"Found {len(updated_scripts)} updated script(s) in {selected_file}")
 
         # Parse LST file
         parse_start = time.perf_counter()
         new_routines = {}
         if len(updated_scripts) > 0:
+            # Scripts injected by earlier saves are referenced like new scripts,
+            # so pointers to them resolve to their injected copies
             new_routines = self.lst_parser.parse_lst(
                 src_lst_live,
                 updated_scripts,
                 selected_file,
                 needs_macro_adjustment,
                 global_state['used_global_labels'],
-                global_state['new_script_labels']
+                global_state['new_script_labels'].union(carried_labels)
             )
         parse_end = time.perf_counter()
         self.logger.log_profiling(f"parse_lst took {parse_end - parse_start:.4f}s")
+        self.timings['parse'] = parse_end - parse_start
 
-        # Create output directory and clean it
-        changed_output_path = build_dir / "bin/" / base_path
-        self.file_manager.cleanup_output_directory(changed_output_path)
-
-        # Load existing generated files
-        generated_files = self.file_manager.load_generated_files_json(build_dir / "porylive_generated_files.json")
-        generated_files[selected_file] = []
-
-        # Write binary files
-        file_infos = self.file_manager.write_binary_files(new_routines, changed_output_path, selected_file)
-        generated_files[selected_file] = file_infos
+        if self.config_manager.rolling_baseline:
+            self.baseline_store.stage(selected_file, src_lst_old, self.script_differ.stripped_lines,
+                                      global_state['new_script_labels'])
 
-        # Write JSON and Lua files
-        self.file_manager.write_generated_files_json(generated_files, build_dir / "porylive_generated_files.json")
-        self.file_manager.write_generated_files_lua(generated_files, build_dir / "porylive_generated_files.lua")
+        source_end = time.perf_counter()
+        self.logger.log_profiling(f"process_source({selected_file}) took {source_end - source_start:.4f}s")
+        return {
+            'source': selected_file,
+            'routines': new_routines,
+            'carried_entries': carried_entries,
+        }
 
-        self.notification_manager.send_reload()
-
-        main_end = time.perf_counter()
-        total_main_time = main_end - main_start
-        self.logger.log_profiling(f"main function total time: {total_main_time:.4f}s")
+    def rebase_new_labels(self) -> Set[str]:
+        """Fix up the new labels of a rolling diff against the ROM and return every label in the listing
 
-        return True
+        A label added since the baseline is only new if the ROM does not have
+        it, and a new label from an earlier save is dropped once it is deleted.
+        """
+        live_labels = {line[:-1] for line in self.script_differ.stripped_lines
+                       if line.endswith(':') and not line.startswith(' ')}
+        self.script_differ.new_script_labels = {
+            label for label in self.script_differ.new_script_labels
+            if label in live_labels and self.map_file_manager.get_label_address(label) is None
+        }
+        self.script_differ.used_global_labels &= self.script_differ.new_script_labels
+        return live_labels
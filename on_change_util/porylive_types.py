@@ -1,6 +1,6 @@
 import re
 from pathlib import Path
-from typing import TypedDict, List, Dict, Set
+from typing import TypedDict, List, Dict, Optional, Set
 
 class ScriptParams(TypedDict):
     name: str
@@ -28,6 +28,19 @@ class GeneratedFileInfo(TypedDict):
     filename: str
     lua_adjustments: List[LuaAdjustment]
 
+class ManifestSource(TypedDict):
+    entries: List[GeneratedFileInfo]
+    fragments: List[str]
+
+class SourceResult(TypedDict):
+    source: str
+    routines: Dict[str, RoutineData]
+    carried_entries: List[GeneratedFileInfo]  # Finished entries reused as they are, e.g. from earlier saves
+
+class MemoSource(TypedDict):
+    entries: List[GeneratedFileInfo]
+    baseline: Optional[Dict]  # Exported rolling baseline, if rolling baseline mode was enabled
+
 # Constants
 SECTION_PATTERN = re.compile(r'\.section script_data,"aw",%progbits')
 
@@ -37,6 +50,11 @@ SUPPORTED_FILES = [
     'data/event_scripts.s'
 ]
 
+def is_supported_file(updated_file: str) -> bool:
+    """Check whether a changed file can affect a supported file, before anything else is loaded"""
+    # .inc files are included by event_scripts.s, and .pory files are compiled into .inc files
+    return updated_file.endswith(('.inc', '.pory', *SUPPORTED_FILES))
+
 # Global state types (these will be managed by appropriate classes)
 GlobalState = TypedDict('GlobalState', {
     'new_script_labels': Set[str],
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+from .file_lock import file_lock
+from .logger import Logger
+
+# Bumped whenever the way outputs are cached changes
+PORYSCRIPT_CACHE_VERSION = 1
+
+# Number of cached outputs kept, the least recently used are removed first
+PORYSCRIPT_CACHE_ENTRIES = 256
+
+# Files that change the output of poryscript for the same .pory file, relative to the project directory
+PORYSCRIPT_TOOL_FILES = [
+    "tools/poryscript/poryscript",
+    "tools/poryscript/command_config.json",
+    "tools/poryscript/font_config.json",
+]
+
+class PoryscriptCache:
+    """Caches poryscript outputs by .pory content and marks the .inc files porylive writes
+
+    A .pory file whose contents were already compiled with the same
+    poryscript binary and configs gets its .inc file from the cache instead
+    of running poryscript. Every .inc file written from a .pory file is
+    marked with its size and mtime, so the watchman trigger it causes can
+    be dropped: the pipeline already continued with it in-process.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path):
+        self.logger = logger
+        self.project_dir = project_dir
+
+        self.cache_dir = project_dir / ".porylive" / "poryscript"
+        self.markers_path = self.cache_dir / "generated.json"
+        self.lock_path = self.cache_dir / "poryscript.lock"
+
+    def compute_key(self, pory_file_path: Path) -> str:
+        """Hash the .pory file together with the tool and its configs"""
+        key_hash = hashlib.blake2b(str(PORYSCRIPT_CACHE_VERSION).encode(), digest_size=16)
+        key_hash.update(pory_file_path.read_bytes())
+        for tool_file in PORYSCRIPT_TOOL_FILES:
+            path = self.project_dir / tool_file
+            try:
+                if path.suffix == ".json":
+                    key_hash.update(path.read_bytes())
+                else:
+                    # The binary is only identified by its stat, hashing it on every save is not worth it
+                    stat = path.stat()
+                    key_hash.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+            except FileNotFoundError:
+                key_hash.update(b"missing")
+        return key_hash.hexdigest()
+
+    def output_path(self, key: str) -> Path:
+        """Get the path of the cached output with the given key"""
+        return self.cache_dir / f"{key}.inc"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a cached output, marking it as recently used"""
+        path = self.output_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Cache an output, then remove the least recently used outputs over the limit"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        outputs = sorted(self.cache_dir.glob("*.inc"), key=lambda output: output.stat().st_mtime)
+        for output in outputs[:-PORYSCRIPT_CACHE_ENTRIES]:
+            try:
+                output.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _read_markers(self) -> Dict[str, List[int]]:
+        try:
+            with open(self.markers_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_markers(self, markers: Dict[str, List[int]]):
+        tmp_path = self.markers_path.with_name(f".{self.markers_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(markers, f)
+        os.replace(tmp_path, self.markers_path)
+
+    def write_inc_file(self, inc_file: str, data: bytes) -> bool:
+        """Write a generated .inc file if its contents changed, marking it first, and return whether it was written"""
+        inc_path = self.project_dir / inc_file
+        try:
+            if inc_path.read_bytes() == data:
+                return False
+        except FileNotFoundError:
+            pass
+
+        # The rename keeps the size and mtime, so the marker exists before watchman can see the file
+        tmp_path = inc_path.with_name(f".{inc_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        stat = tmp_path.stat()
+        with file_lock(self.lock_path):
+            markers = self._read_markers()
+            markers[inc_file] = [stat.st_mtime_ns, stat.st_size]
+            self._write_markers(markers)
+        os.replace(tmp_path, inc_path)
+        return True
+
+    def is_generated(self, updated_file: str) -> bool:
+        """Check whether porylive wrote an .inc file itself, without consuming its marker"""
+        if not updated_file.endswith(".inc"):
+            return False
+        with file_lock(self.lock_path):
+            marker = self._read_markers().get(updated_file)
+        try:
+            stat = (self.project_dir / updated_file).stat()
+        except FileNotFoundError:
+            return False
+        return marker == [stat.st_mtime_ns, stat.st_size]
+
+    def drop_generated(self, updated_files: List[str]) -> List[str]:
+        """Remove the .inc files porylive wrote itself, unless they were changed since"""
+        if not any(updated_file.endswith(".inc") for updated_file in updated_files):
+            return updated_files
+
+        with file_lock(self.lock_path):
+            markers = self._read_markers()
+            if not markers:
+                return updated_files
+
+            kept = []
+            for updated_file in updated_files:
+                marker = markers.pop(updated_file, None)
+                if marker is not None:
+                    try:
+                        stat = (self.project_dir / updated_file).stat()
+                        if marker == [stat.st_mtime_ns, stat.st_size]:
+                            continue
+                    except FileNotFoundError:
+                        pass
+                kept.append(updated_file)
+            self._write_markers(markers)
+        return kept
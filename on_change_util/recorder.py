@@ -0,0 +1,105 @@
+import hashlib
+import json
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from .logger import Logger
+from .porylive_types import GeneratedFileInfo
+
+# Bumped whenever the layout of session archives changes
+SESSION_FORMAT_VERSION = 1
+
+class SessionRecorder:
+    """Records the inputs and outputs of every processing cycle into a session archive
+
+    A session archive is a zip file under .porylive/sessions/, started anew
+    with every `make live`. Listings, the sym file and the macro data are
+    stored once per content hash and compressed, and each cycle is a small
+    JSON record that refers to them, so a session can be replayed offline
+    through the same pipeline.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path):
+        self.logger = logger
+        self.sessions_dir = project_dir / ".porylive" / "sessions"
+
+    @staticmethod
+    def session_name(original_listings: List[Path], sym_file: Path) -> str:
+        """Name the session after the files `make live` produced"""
+        versions = []
+        for path in original_listings + [sym_file]:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            versions.append([str(path), stat.st_mtime_ns, stat.st_size])
+        return "session-" + hashlib.blake2b(json.dumps(versions).encode(), digest_size=8).hexdigest() + ".zip"
+
+    @staticmethod
+    def _add_blob(archive: zipfile.ZipFile, names: set, data: bytes) -> str:
+        """Store data once per content hash and return its digest"""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        name = f"blobs/{digest}"
+        if name not in names:
+            archive.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED)
+            names.add(name)
+        return digest
+
+    def record_cycle(self, session_name: str, updated_files: List[str], sources: Dict[str, Dict],
+                     sym_file: Path, macro_data_file: Path, rolling_baseline: bool,
+                     timings: Dict[str, float]):
+        """Append one cycle to the session archive
+
+        sources maps each processed source to the paths of its listings and,
+        in rolling baseline mode, the baseline and manifest entries it
+        started from, along with the manifest entries it ended with.
+        """
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = self.sessions_dir / session_name
+
+        with zipfile.ZipFile(archive_path, "a") as archive:
+            names = set(archive.namelist())
+            cycle_number = sum(1 for name in names if name.startswith("cycles/")) + 1
+
+            record = {
+                'format': SESSION_FORMAT_VERSION,
+                'time': datetime.now().isoformat(timespec="seconds"),
+                'updated_files': updated_files,
+                'sym_file': self._add_blob(archive, names, sym_file.read_bytes()),
+                'macro_data': self._add_blob(archive, names, macro_data_file.read_bytes()),
+                'rolling_baseline': rolling_baseline,
+                'timings': timings,
+                'sources': {},
+            }
+            for source, source_data in sources.items():
+                record['sources'][source] = {
+                    'old_listing': self._add_blob(archive, names, source_data['old_listing'].read_bytes()),
+                    'new_listing': self._add_blob(archive, names, source_data['new_listing'].read_bytes()),
+                    'baseline': source_data.get('baseline'),
+                    'previous_entries': digest_entries(source_data.get('previous_entries', [])),
+                    'outputs': digest_entries(source_data['outputs']),
+                }
+
+            archive.writestr(f"cycles/{cycle_number:05d}.json", json.dumps(record))
+
+        self.logger.log_profiling(f"Recorded cycle {cycle_number} in {archive_path}")
+
+def digest_entries(entries: List[GeneratedFileInfo]) -> List[Dict]:
+    """Replace the binary paths of manifest entries by their content digests, which are their file names"""
+    return [{**entry, 'filename': Path(entry['filename']).stem} for entry in entries]
+
+def load_session(archive_path: Path) -> List[Dict]:
+    """Read the cycle records of a session archive, in order"""
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        names = sorted(name for name in archive.namelist() if name.startswith("cycles/"))
+        return [json.loads(archive.read(name)) for name in names]
+
+def read_blob(archive: zipfile.ZipFile, digest: str) -> bytes:
+    """Read a listing, sym file or macro data blob of a session archive"""
+    return archive.read(f"blobs/{digest}")
+
+def find_latest_session(project_dir: Path) -> Optional[Path]:
+    """Find the most recently written session archive of a project"""
+    archives = list((project_dir / ".porylive" / "sessions").glob("session-*.zip"))
+    return max(archives, key=lambda path: path.stat().st_mtime) if archives else None
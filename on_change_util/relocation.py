@@ -0,0 +1,234 @@
+import re
+import struct
+import sys
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from .porylive_types import LuaAdjustment, RoutineData, ScriptParams
+
+if TYPE_CHECKING:
+    from .macro_processor import MacroProcessor
+
+ADDRESS_STRUCT = struct.Struct("<I")
+
+ARG_REFERENCE_PATTERN = re.compile(r'^\$arg\[(\d+)\]$')
+
+class Relocation(NamedTuple):
+    """A single 4-byte address patch within a macro's data"""
+    offset: int
+    kind: str                 # "address", "offset" or "dynamic"
+    arg: Union[int, str]      # Index into the script's params, or a literal symbol name
+    addend: int
+    macro: str                # Name of the (possibly nested) macro, for error messages
+
+class RelocationTemplate(NamedTuple):
+    """A macro flattened into its relocations, including those of nested macros"""
+    relocations: Tuple[Relocation, ...]
+    min_params: int           # Params that nested $arg[n] references require
+    min_data_length: int      # Bytes the relocations patch up to
+
+class NotCompilable(Exception):
+    """The macro depends on script params in a way a template cannot express"""
+
+class ArgReference:
+    """A nested macro param that refers to a param of the top-level script
+
+    Comparing it raises NotCompilable, so conditions that depend on the
+    script's params are detected while a nested conditional is evaluated.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __eq__(self, other):
+        raise NotCompilable(f"condition depends on $arg[{self.index}]")
+
+    __hash__ = object.__hash__
+
+class RelocationCompiler:
+    """Flattens macro definitions into relocation templates and applies them
+
+    Applying a template is equivalent to MacroProcessor.adjust_data_from_macro
+    walking the same adjustments recursively. Macros whose nested macro names,
+    nested conditions or symbol names depend on the script's params cannot be
+    flattened, and keep using the recursive path.
+    """
+
+    def __init__(self, macro_processor: "MacroProcessor"):
+        self.macro_processor = macro_processor
+        self._templates: Dict[Tuple[str, str, int], Optional[RelocationTemplate]] = {}
+
+    def get_template(self, script_name: str, adjustments: List[Dict[str, Any]],
+                     src_file: str) -> Optional[RelocationTemplate]:
+        """Get the template for a macro's selected adjustments, compiling it on first use"""
+        # The adjustment lists live in the cached macro data, so their identity is a stable key
+        key = (src_file, script_name, id(adjustments))
+        if key not in self._templates:
+            relocations: List[Relocation] = []
+            try:
+                min_params = self._flatten(script_name, adjustments, None, 0, src_file, relocations)
+            except NotCompilable:
+                self._templates[key] = None
+            else:
+                min_data_length = max((relocation.offset + 4 for relocation in relocations), default=0)
+                self._templates[key] = RelocationTemplate(tuple(relocations), min_params, min_data_length)
+        return self._templates[key]
+
+    def _resolve_nested_value(self, value: Any, params: Optional[List[Any]]) -> Any:
+        """Resolve a $arg[n] reference of a nested macro without a concrete script"""
+        if not isinstance(value, str):
+            return value
+        arg_match = ARG_REFERENCE_PATTERN.match(value)
+        if not arg_match:
+            return value
+
+        arg_index = int(arg_match.group(1))
+        if params is None:
+            # A reference to the top-level script's params
+            return ArgReference(arg_index)
+        if arg_index >= len(params):
+            # The recursive path logs this and keeps the literal reference
+            raise NotCompilable(f"$arg[{arg_index}] is out of range")
+        return params[arg_index]
+
+    def _flatten(self, script_name: str, adjustments: List[Dict[str, Any]], params: Optional[List[Any]],
+                 base_offset: int, src_file: str, relocations: List[Relocation]) -> int:
+        """Append the relocations of a macro's adjustments, returning the params they require
+
+        params is None for the top-level script, whose params are only known
+        when the template is applied. Nested params are ArgReference objects
+        or literal values.
+        """
+        min_params = 0
+        for info in adjustments:
+            if info["type"] == "macro":
+                macro_name = self._resolve_nested_value(info["name"], params)
+                if not isinstance(macro_name, str):
+                    raise NotCompilable("nested macro name depends on the script's params")
+
+                if "param_len" in info:
+                    nested_params = [0] * info["param_len"]
+                elif isinstance(info["params"], dict):
+                    nested_params = self._nested_params_dict(info["params"], params)
+                else:
+                    nested_params = [self._resolve_nested_value(param, params) for param in info["params"]]
+
+                for param in nested_params:
+                    if isinstance(param, ArgReference):
+                        min_params = max(min_params, param.index + 1)
+
+                nested_adjustments = self._select_nested_adjustments(macro_name, nested_params, src_file)
+                min_params = max(min_params, self._flatten(
+                    macro_name, nested_adjustments, nested_params,
+                    base_offset + info.get("offset", 0), src_file, relocations))
+            elif "index" in info.keys() and params is not None and info["index"] >= len(params):
+                continue
+            elif info["type"] in ("address", "offset", "dynamic"):
+                relocations.append(Relocation(
+                    info["offset"] + base_offset,
+                    info["type"],
+                    self._relocation_arg(info, params),
+                    info.get("add", 0),
+                    script_name,
+                ))
+        return min_params
+
+    def _nested_params_dict(self, params_dict: Dict[str, Any], params: Optional[List[Any]]) -> List[Any]:
+        """Build nested params from the dictionary format, like _resolve_macro_params_dict"""
+        try:
+            indices = {int(key): value for key, value in params_dict.items()}
+        except ValueError:
+            raise NotCompilable("invalid params index key")
+        nested_params: List[Any] = [0] * (max(indices.keys(), default=0) + 1)
+        for index, value in indices.items():
+            nested_params[index] = self._resolve_nested_value(value, params)
+        return nested_params
+
+    def _select_nested_adjustments(self, macro_name: str, nested_params: List[Any],
+                                   src_file: str) -> List[Dict[str, Any]]:
+        """Select a nested macro's adjustments, evaluating conditions on its known params"""
+        macros_to_adjust = self.macro_processor.config_manager.get_macros_to_adjust(src_file)
+        macro_info = self.macro_processor.find_macro(macro_name, macros_to_adjust, src_file)
+        if not macro_info:
+            return []
+        if isinstance(macro_info, dict) and ("$condition" in macro_info or "$if" in macro_info):
+            # Raises NotCompilable if a condition compares an ArgReference
+            return self.macro_processor.conditional_processor.process_conditional_macro(
+                {"name": macro_name, "params": nested_params, "data": bytearray()}, macro_info)
+        if isinstance(macro_info, list):
+            return macro_info
+        raise NotCompilable("unknown macro_info type")
+
+    def _relocation_arg(self, info: Dict[str, Any], params: Optional[List[Any]]) -> Union[int, str]:
+        """Get the param index or literal symbol name a relocation patches in"""
+        if "name" in info and info["type"] == "address" and not (params is None and "index" in info):
+            if not isinstance(info["name"], str):
+                raise NotCompilable("non-string symbol name")
+            return info["name"]
+        if "name" in info or "index" not in info:
+            raise NotCompilable("relocation needs both a name and an index")
+
+        if params is None:
+            return info["index"]
+        value = params[info["index"]]
+        if isinstance(value, ArgReference):
+            return value.index
+        if isinstance(value, str):
+            return value
+        raise NotCompilable("non-string symbol name")
+
+    def apply(self, template: RelocationTemplate, script: ScriptParams, routines: Dict[str, RoutineData],
+              new_script_labels: Set[str], updated_scripts: Set[str]) -> Optional[List[LuaAdjustment]]:
+        """Patch a script's data from a template, returning None if the recursive path must be used"""
+        params = script["params"]
+        data = script["data"]
+        if len(params) < template.min_params or len(data) < template.min_data_length:
+            return None
+
+        map_file_manager = self.macro_processor.map_file_manager
+        logger = self.macro_processor.logger
+        lua_adjustments: List[LuaAdjustment] = []
+
+        for offset, kind, arg, addend, macro in template.relocations:
+            if isinstance(arg, int):
+                if arg >= len(params):
+                    continue
+                name = params[arg]
+            else:
+                name = arg
+
+            # Do not process if name is a hex number (e.g. 0x8000000)
+            if name.startswith("0x"):
+                continue
+
+            if kind == "dynamic":
+                kind = "address" if data[offset:offset + 4] == b"\x00\x00\x00\x00" else "offset"
+
+            if kind == "address":
+                # New labels are looked up as labels, so they do not need the whole sym file
+                if name in new_script_labels:
+                    address = map_file_manager.get_label_address(name)
+                else:
+                    address = map_file_manager.get_sym_file_address(name)
+                if address is not None:
+                    ADDRESS_STRUCT.pack_into(data, offset, address + addend)
+                elif name in new_script_labels:
+                    lua_adjustments.append({"label": name, "offset": offset, "address_offset": 0})
+                else:
+                    logger.log_message(f"[address] Unknown symbol for {macro}: {name}")
+                    sys.exit(1)
+            elif name in routines:
+                if name in new_script_labels or name in updated_scripts:
+                    lua_adjustments.append({"label": name, "offset": offset, "address_offset": 0})
+                else:
+                    address = routines[name].get('original_address')
+                    if address is None:
+                        logger.log_message(f"[offset] No address found for script: {name}")
+                        sys.exit(1)
+                    ADDRESS_STRUCT.pack_into(data, offset, address)
+            else:
+                address = map_file_manager.get_sym_file_address(name)
+                if address is None:
+                    logger.log_message(f"[offset] Unknown symbol for {macro}: {name}")
+                    sys.exit(1)
+                ADDRESS_STRUCT.pack_into(data, offset, address + addend)
+
+        return lua_adjustments
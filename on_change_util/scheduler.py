@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+from .logger import Logger
+from .file_lock import file_lock
+
+class CycleCancelled(Exception):
+    """A newer save superseded the running processing cycle"""
+
+class Scheduler:
+    """Makes overlapping on-change invocations single-flight
+
+    Every invocation registers its files as pending and bumps a shared
+    generation counter. After a debounce window, only the invocation holding
+    the latest generation runs the pipeline, for the files of every
+    invocation it superseded. A running cycle checks the counter between
+    stages and stops as soon as a newer save registers.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path, debounce_seconds: float):
+        self.logger = logger
+        self.debounce_seconds = debounce_seconds
+
+        state_dir = project_dir / ".porylive"
+        self.generation_path = state_dir / "generation"
+        self.pending_path = state_dir / "pending_files"
+        self.state_lock_path = state_dir / "scheduler.lock"
+        self.pipeline_lock_path = state_dir / "pipeline.lock"
+
+        self.generation: Optional[int] = None
+        self._claimed_count = 0
+
+    def _read_generation(self) -> int:
+        try:
+            with open(self.generation_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _read_pending(self) -> List[str]:
+        try:
+            with open(self.pending_path, "r") as f:
+                return [line.rstrip("\n") for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def register(self, updated_files: List[str]):
+        """Queue this invocation's files and make it the latest generation"""
+        with file_lock(self.state_lock_path):
+            self.generation = self._read_generation() + 1
+            with open(self.generation_path, "w") as f:
+                f.write(str(self.generation))
+            with open(self.pending_path, "a") as f:
+                f.writelines(f"{updated_file}\n" for updated_file in updated_files)
+
+    def supersede(self):
+        """Stop any running cycle without queueing files, for changes that are queued in-process"""
+        with file_lock(self.state_lock_path):
+            generation = self._read_generation() + 1
+            with open(self.generation_path, "w") as f:
+                f.write(str(generation))
+
+    def follow(self):
+        """Take the current generation without registering, so background work stops for the next save"""
+        with file_lock(self.state_lock_path):
+            self.generation = self._read_generation()
+
+    def is_current(self) -> bool:
+        """Check whether no newer save has registered since this one"""
+        return self._read_generation() == self.generation
+
+    def check(self, stage: str):
+        """Stop the cycle before a stage if a newer save superseded it"""
+        if not self.is_current():
+            raise CycleCancelled(f"superseded before {stage}")
+
+    def wait_debounce(self):
+        """Give quickly repeated saves a chance to supersede this one"""
+        if self.debounce_seconds > 0:
+            time.sleep(self.debounce_seconds)
+        self.check("debounce")
+
+    @contextmanager
+    def pipeline(self) -> Iterator[None]:
+        """Run one cycle at a time, after any cancelled cycle has released the pipeline"""
+        wait_start = time.perf_counter()
+        with file_lock(self.pipeline_lock_path):
+            wait_end = time.perf_counter()
+            self.logger.log_profiling(f"Waiting for the pipeline took {wait_end - wait_start:.4f}s")
+            self.check("pipeline")
+            yield
+
+    def claim_pending(self) -> List[str]:
+        """Get the files of this and every superseded invocation, without duplicates"""
+        with file_lock(self.state_lock_path):
+            pending = self._read_pending()
+        self._claimed_count = len(pending)
+        return list(dict.fromkeys(pending))
+
+    def complete(self):
+        """Drop the claimed files, keeping files registered while the cycle ran"""
+        with file_lock(self.state_lock_path):
+            pending = self._read_pending()[self._claimed_count:]
+            with open(self.pending_path, "w") as f:
+                f.writelines(f"{updated_file}\n" for updated_file in pending)
+        self._claimed_count = 0
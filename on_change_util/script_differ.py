@@ -1,13 +1,94 @@
-import difflib
+import mmap
+import os
 import re
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Set, Tuple, Dict
+from typing import Iterable, List, Optional, Set, Tuple, Dict
 from .logger import Logger
 from .config import ConfigManager
 from .porylive_types import SECTION_PATTERN, GlobalState
+from .workers import in_worker, strip_lst_files_parallel
+
+# Listings at least this large are stripped in parallel chunks. Measured with
+# `porylive_benchmark.py strip`, stripping takes about 30ms/MiB, sending the
+# chunks back a few ms/MiB and starting the workers 25ms or more on the first
+# strip of a process, so with 2 CPUs the parallel path pays off from 2-3 MiB
+PARALLEL_STRIP_THRESHOLD = 4 * 1024 * 1024
+
+# The .section line the script data starts after, matched by SECTION_PATTERN
+SECTION_MARKER = b'.section script_data,"aw",%progbits'
+
+# Matches a listing line holding a label, used to split listings into chunks
+LABEL_LINE_PATTERN = re.compile(rb'^[ \t]*\d+[ \t]+[^\s:;]+::?[ \t]*\r?$', re.MULTILINE)
+
+def _strip_lines(lines: Iterable[str], stripped_lines: List[str]):
+    """Strip listing lines after the .section line down to just labels and script calls"""
+    for line in lines:
+        line = line.rstrip()
+
+        # Replace empty lines, form feed characters, and page headers with newlines
+        if not line or line.startswith("\x0c") or "ARM GAS" in line:
+            continue
+
+        # Check for label line - it will have a colon and start with spaces followed by a number
+        if ':' in line and line.lstrip().split()[0].isdigit():
+            # Extract label name - it's the part before the colon, after the number
+            colon_part = line.split(':')[0]
+            if colon_part.strip().split():
+                label_name = colon_part.strip().split()[-1]
+                stripped_lines.append(f"{label_name}:")
+
+        # Check for script/macro calls (lines with hex data and macro names)
+        elif line.strip():
+            parts = line.split(';')[0].split()
+            # Look for lines that have at least 4 parts (line_num, address, hex_data, macro_name)
+            if len(parts) >= 4:
+                macro_name = parts[3]
+                if macro_name == ".align":
+                    continue
+                params = ",".join(parts[4:]) if len(parts) > 4 else ""
+                if params:
+                    stripped_lines.append(f" {macro_name} {params}")
+                else:
+                    stripped_lines.append(f" {macro_name}")
+
+def split_lst_ranges(lst_path: Path, num_chunks: int) -> List[Tuple[int, int]]:
+    """Split the script section of an LST file into byte ranges that start at label lines"""
+    with open(lst_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            section_pos = mm.find(SECTION_MARKER)
+            if section_pos < 0:
+                return []
+            start = mm.find(b'\n', section_pos)
+            start = len(mm) if start < 0 else start + 1
+
+            boundaries = [start]
+            chunk_size = (len(mm) - start) // max(1, num_chunks)
+            for i in range(1, num_chunks):
+                match = LABEL_LINE_PATTERN.search(mm, max(boundaries[-1] + 1, start + i * chunk_size))
+                if not match:
+                    break
+                boundaries.append(match.start())
+            boundaries.append(len(mm))
+
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+def strip_lst_range(lst_path: Path, start: int, end: int) -> str:
+    """Strip one byte range of an LST file
+
+    The stripped label and script lines are returned joined into a single
+    string, which is much cheaper to send back from a worker process than
+    a list of small strings.
+    """
+    with open(lst_path, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start).decode()
+
+    # Split like text mode iteration does, so form feeds stay part of their line
+    stripped_lines: List[str] = []
+    _strip_lines(chunk.replace('\r\n', '\n').replace('\r', '\n').split('\n'), stripped_lines)
+    return "\n".join(stripped_lines)
 
 class ScriptDiffer:
     """Handles script comparison and diffing between LST files"""
@@ -20,54 +101,49 @@ class ScriptDiffer:
         self.new_script_labels: Set[str] = set()
         self.used_global_labels: Set[str] = set()
 
+        # Stripped lines of the newest listing, kept as the next rolling baseline
+        self.stripped_lines: List[str] = []
+
+    def reset(self):
+        """Clear the global state before diffing another source"""
+        self.new_script_labels = set()
+        self.used_global_labels = set()
+        self.stripped_lines = []
+
     def strip_lst_file(self, lst_path: Path) -> list:
         """Strip an LST file down to just labels and script calls"""
         strip_start = time.perf_counter()
         stripped_lines = []
-        started_parsing = False
 
         with open(lst_path, 'r') as f:
+            # Wait for the .section line before starting to parse
             for line in f:
-                line = line.rstrip()
-
-                # Wait for the .section line before starting to parse
-                if not started_parsing:
-                    if SECTION_PATTERN.search(line):
-                        started_parsing = True
-                    continue
-
-                # Replace empty lines, form feed characters, and page headers with newlines
-                if not line or line.startswith("\x0c") or "ARM GAS" in line:
-                    continue
-
-                # Check for label line - it will have a colon and start with spaces followed by a number
-                if ':' in line and line.lstrip().split()[0].isdigit():
-                    # Extract label name - it's the part before the colon, after the number
-                    colon_part = line.split(':')[0]
-                    if colon_part.strip().split():
-                        label_name = colon_part.strip().split()[-1]
-                        stripped_lines.append(f"{label_name}:")
-
-                # Check for script/macro calls (lines with hex data and macro names)
-                elif started_parsing and line.strip():
-                    parts = line.split(';')[0].split()
-                    # Look for lines that have at least 4 parts (line_num, address, hex_data, macro_name)
-                    if len(parts) >= 4:
-                        macro_name = parts[3]
-                        if macro_name == ".align":
-                            continue
-                        params = ",".join(parts[4:]) if len(parts) > 4 else ""
-                        if params:
-                            stripped_lines.append(f" {macro_name} {params}")
-                        else:
-                            stripped_lines.append(f" {macro_name}")
+                if SECTION_PATTERN.search(line):
+                    break
+            _strip_lines(f, stripped_lines)
 
         strip_end = time.perf_counter()
         self.logger.log_profiling(f"strip_lst_file({lst_path}) took {strip_end - strip_start:.4f}s, {len(stripped_lines)} lines")
         return stripped_lines
 
-    def get_updated_scripts(self, lst_path_old: Path, lst_path_new: Path, src_file: str) -> Tuple[Set[str], bool]:
-        """Strip file down to just labels and script calls, then diff the two files"""
+    def strip_lst_files(self, lst_paths: List[Path]) -> List[list]:
+        """Strip several LST files, splitting large ones across worker processes"""
+        if (in_worker() or (os.cpu_count() or 1) < 2
+                or all(lst_path.stat().st_size < PARALLEL_STRIP_THRESHOLD for lst_path in lst_paths)):
+            return [self.strip_lst_file(lst_path) for lst_path in lst_paths]
+
+        strip_start = time.perf_counter()
+        stripped_files = strip_lst_files_parallel(lst_paths)
+        strip_end = time.perf_counter()
+        self.logger.log_profiling(f"Parallel strip of {len(lst_paths)} file(s) took {strip_end - strip_start:.4f}s")
+        return stripped_files
+
+    def get_updated_scripts(self, lst_path_old: Path, lst_path_new: Path, src_file: str,
+                            old_stripped: Optional[List[str]] = None) -> Tuple[Set[str], bool]:
+        """Strip file down to just labels and script calls, then diff the two files
+
+        old_stripped replaces the stripped old listing, e.g. with a rolling baseline.
+        """
 
         start_time = time.perf_counter()
         self.logger.log_profiling("Starting get_updated_scripts")
@@ -79,18 +155,18 @@ class ScriptDiffer:
             self.logger.log_message(f"File not found: {lst_path_new}")
             sys.exit(1)
 
-        # Strip both files in parallel
-        parallel_start = time.perf_counter()
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            old_future = executor.submit(self.strip_lst_file, lst_path_old)
-            new_future = executor.submit(self.strip_lst_file, lst_path_new)
-
-            old_stripped = old_future.result()
-            new_stripped = new_future.result()
-        parallel_end = time.perf_counter()
-        self.logger.log_profiling(f"Parallel file stripping took {parallel_end - parallel_start:.4f}s")
+        # Strip both files, in worker processes when they are large enough to benefit
+        strip_start = time.perf_counter()
+        if old_stripped is None:
+            old_stripped, new_stripped = self.strip_lst_files([lst_path_old, lst_path_new])
+        else:
+            new_stripped = self.strip_lst_files([lst_path_new])[0]
+        self.stripped_lines = new_stripped
+        strip_end = time.perf_counter()
+        self.logger.log_profiling(f"File stripping took {strip_end - strip_start:.4f}s")
 
         # Generate diff using unified_diff (more efficient than Differ)
+        import difflib  # Imported here to keep it out of startup
         diff_start = time.perf_counter()
         unified_diff = list(difflib.unified_diff(
             old_stripped,
@@ -0,0 +1,206 @@
+import os
+import shutil
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from .logger import Logger
+from .porylive_types import is_supported_file
+from .scheduler import CycleCancelled, Scheduler
+
+if TYPE_CHECKING:
+    from .porylive_processor import PoryliveProcessor
+
+# Largest buffer accepted from an editor
+MAX_CONTENTS_SIZE = 64 * 1024 * 1024
+
+class ShadowTree:
+    """A mirror of the project made of symlinks, with some files replaced by unsaved contents
+
+    The directories leading to a replaced file or to an output directory
+    are real directories, and everything else in them is a symlink into the
+    project. Files with .live. in their name are left out, so make writes
+    the listings it assembles into the shadow tree instead of through a
+    symlink into the real build directory.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path, shadow_dir: Path):
+        self.logger = logger
+        self.project_dir = project_dir.resolve()
+        self.tree_dir = shadow_dir / "tree"
+        self.objects_dir = shadow_dir / "objects"
+
+    def build(self, overrides: Dict[str, bytes], output_dirs: List[Path]) -> Path:
+        """Build the tree from scratch, returning its root"""
+        build_start = time.perf_counter()
+        overrides = {Path(path): contents for path, contents in overrides.items()}
+        real_dirs = set()
+        for path in list(overrides) + output_dirs:
+            real_dirs.update(path.parents)
+        real_dirs.update(output_dirs)
+
+        # Neither contains files of the project, only symlinks and blobs
+        shutil.rmtree(self.tree_dir, ignore_errors=True)
+        shutil.rmtree(self.objects_dir, ignore_errors=True)
+        self._mirror(Path(), real_dirs, overrides)
+
+        build_end = time.perf_counter()
+        self.logger.log_profiling(f"Shadow tree build took {build_end - build_start:.4f}s")
+        return self.tree_dir
+
+    def _mirror(self, relative_dir: Path, real_dirs: set, overrides: Dict[Path, bytes]):
+        shadow_dir = self.tree_dir / relative_dir
+        shadow_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            entries = list(os.scandir(self.project_dir / relative_dir))
+        except FileNotFoundError:
+            entries = []
+
+        for entry in entries:
+            relative_path = relative_dir / entry.name
+            if relative_path in overrides or relative_path == Path(".porylive"):
+                continue
+            if relative_path in real_dirs and entry.is_dir():
+                self._mirror(relative_path, real_dirs, overrides)
+            elif ".live." not in entry.name:
+                os.symlink(entry.path, shadow_dir / entry.name)
+
+        # Output directories may not exist in the project yet
+        for real_dir in real_dirs:
+            if real_dir.parent == relative_dir and real_dir != relative_dir and not (self.tree_dir / real_dir).exists():
+                self._mirror(real_dir, real_dirs, overrides)
+
+        for path, contents in overrides.items():
+            if path.parent == relative_dir:
+                (self.tree_dir / path).write_bytes(contents)
+
+class SpeculationServer:
+    """Processes unsaved editor buffers in the background, so their save is injected right away
+
+    An editor connects to localhost on the speculation port and sends
+    "SPECULATE <path> <length>" on one line, followed by the contents of a
+    supported file. The path is relative to the project directory. The
+    server replies "ACK SPECULATE" once the contents are queued, or
+    "ERROR <reason>". Only the latest contents of each file are processed,
+    one file at a time, and any save stops the processing.
+
+    Results are kept in the memo cache until they are used by a save, and
+    are discarded once newer contents of the same file are processed or
+    when all speculative results exceed the budget, oldest first.
+    """
+
+    def __init__(self, logger: Logger, processor: "PoryliveProcessor", port: int, budget_bytes: int):
+        self.logger = logger
+        self.processor = processor
+        self.project_dir = processor.config_manager.project_dir
+        self.port = port
+        self.budget_bytes = budget_bytes
+
+        self._pending: "OrderedDict[str, bytes]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._stopped = False
+        # Memo key and size of the speculative results of each file, oldest first
+        self._results: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, path: str, contents: bytes) -> Optional[str]:
+        """Queue the contents of a file, replacing older contents not processed yet, and return any error"""
+        relative_path = Path(path)
+        if relative_path.is_absolute() or ".." in relative_path.parts:
+            return "path must be relative to the project directory"
+        if not is_supported_file(path):
+            return f"file not supported with porylive: {path}"
+        if path.endswith(".pory"):
+            return "poryscript files are only processed once saved"
+        if not (self.project_dir / relative_path).is_file():
+            return f"no such file: {path}"
+
+        with self._condition:
+            self._pending.pop(path, None)
+            self._pending[path] = contents
+            self._condition.notify()
+        return None
+
+    def start(self):
+        """Start listening and processing in background threads"""
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                header = self.rfile.readline(1024).decode("utf-8", "replace").split()
+                if len(header) != 3 or header[0] != "SPECULATE" or not header[2].isdigit():
+                    self.wfile.write(b"ERROR expected SPECULATE <path> <length>\n")
+                    return
+                length = int(header[2])
+                if length > MAX_CONTENTS_SIZE:
+                    self.wfile.write(b"ERROR contents too large\n")
+                    return
+                contents = self.rfile.read(length)
+                if len(contents) != length:
+                    self.wfile.write(b"ERROR incomplete contents\n")
+                    return
+
+                error = server.submit(header[1], contents)
+                self.wfile.write(f"ERROR {error}\n".encode("utf-8") if error else b"ACK SPECULATE\n")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(("localhost", self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        self.logger.log_message(f"Listening for unsaved changes on port {self.port}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        scheduler = Scheduler(self.logger, self.project_dir, 0)
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                path, contents = self._pending.popitem(last=False)
+
+            scheduler.follow()
+            try:
+                result = self.processor.speculate(path, contents, scheduler)
+            except CycleCancelled:
+                self.logger.log_profiling(f"Speculative processing of {path} stopped for a save")
+                continue
+            except SystemExit:
+                # Unsaved contents are often incomplete, the errors were logged
+                continue
+            except Exception as e:
+                self.logger.log_message(f"Error while speculatively processing {path}: {e}")
+                continue
+
+            if result is not None:
+                self._remember(path, *result)
+
+    def _remember(self, path: str, memo_key: str, size: int):
+        """Track new speculative results, discarding the stale ones"""
+        memo_cache = self.processor.memo_cache
+        previous = self._results.pop(path, None)
+        if previous is not None and previous[0] != memo_key and memo_cache.discard(previous[0]):
+            self.logger.log_profiling(f"Discarded stale speculative results of {path}")
+        self._results[path] = (memo_key, size)
+
+        while len(self._results) > 1 and sum(size for _, size in self._results.values()) > self.budget_bytes:
+            oldest_path, (oldest_key, _) = self._results.popitem(last=False)
+            if memo_cache.discard(oldest_key):
+                self.logger.log_profiling(f"Discarded speculative results of {oldest_path} over the budget")
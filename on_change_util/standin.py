@@ -0,0 +1,310 @@
+import hashlib
+import re
+import socketserver
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Sizes of the script memory, matching porylive.lua
+SCRIPT_BUFFER_SIZE = 102400
+SCRIPT_OVERRIDES_SIZE = 200
+
+ADDRESS_PATTERN = re.compile(r"^\s*(\w+)\s*=\s*(0x[0-9a-fA-F]+|\d+),")
+FIELD_PATTERN = re.compile(r'^(\s*)(\w+) = (?:"(.*)"|(-?\d+)),$')
+
+class ReloadReport(NamedTuple):
+    """What a reload wrote, like the summary porylive.lua logs to the console"""
+    scripts: int
+    buffer_used: int
+    overrides_used: int
+    missing_files: List[str]
+    unresolved_adjustments: List[str]
+    errors: List[str]
+
+    @property
+    def buffer_percentage(self) -> float:
+        return self.buffer_used / SCRIPT_BUFFER_SIZE * 100
+
+def load_addresses(addresses_path: Path) -> Dict[str, int]:
+    """Read the porylive symbol addresses from addresses.lua"""
+    addresses = {}
+    with open(addresses_path, "r") as f:
+        for line in f:
+            match = ADDRESS_PATTERN.match(line)
+            if match:
+                addresses[match.group(1)] = int(match.group(2), 0)
+    return addresses
+
+def load_generated_files(generated_files_path: Path) -> List[Dict]:
+    """Read porylive_generated_files.lua into the same entries dofile() returns in porylive.lua"""
+    file_list: List[Dict] = []
+    with open(generated_files_path, "r") as f:
+        for line in f:
+            match = FIELD_PATTERN.match(line.rstrip())
+            if not match:
+                continue
+            indent, key, string_value, int_value = match.groups()
+            value = string_value if string_value is not None else int(int_value)
+
+            # Entry fields are indented by 4 spaces, lua_adjustments fields by 8
+            if len(indent) == 4:
+                if key == "label":
+                    file_list.append({"lua_adjustments": None})
+                file_list[-1][key] = value
+            else:
+                if key == "label":
+                    if file_list[-1]["lua_adjustments"] is None:
+                        file_list[-1]["lua_adjustments"] = []
+                    file_list[-1]["lua_adjustments"].append({})
+                file_list[-1]["lua_adjustments"][-1][key] = value
+    return file_list
+
+class StandinEmulator:
+    """Simulates the script memory of a running game and porylive.lua's reload()
+
+    The script buffer and override table are modelled as plain byte arrays
+    at their symbol addresses. Scripts are laid out in file list order,
+    which is one of the orders porylive.lua's pairs() may produce.
+    """
+
+    def __init__(self, addresses: Dict[str, int]):
+        self.script_buffer = addresses["gPoryLiveScriptBuffer"]
+        self.script_overrides = addresses["gPoryLiveOverrides"]
+
+        self.buffer = bytearray(SCRIPT_BUFFER_SIZE)
+        self.overrides = bytearray(SCRIPT_OVERRIDES_SIZE * 8)
+        self.initialized = 0
+
+        # Buffer address of each loaded script, by label
+        self.script_addresses: Dict[str, int] = {}
+
+    def _write_buffer(self, offset: int, data: bytes):
+        end = offset + len(data)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(end - len(self.buffer)))
+        self.buffer[offset:end] = data
+
+    def _write_override(self, index: int, key: int, script_ptr: int):
+        offset = index * 8
+        if offset + 8 > len(self.overrides):
+            self.overrides.extend(bytes(offset + 8 - len(self.overrides)))
+        struct.pack_into("<II", self.overrides, offset, key, script_ptr)
+
+    def get_overrides(self) -> List[Tuple[int, int]]:
+        """Get the (original address, buffer address) pairs of every used override slot"""
+        slots = struct.iter_unpack("<II", bytes(self.overrides))
+        return [slot for slot in slots if slot != (0, 0)]
+
+    def reload(self, file_list: List[Dict]) -> ReloadReport:
+        """Apply a generated files list the way porylive.lua's reload() does"""
+        # reload() clears the buffer with 4-byte writes at 1-byte steps, so
+        # only its first quarter is zeroed; bytes past that keep old data
+        self.buffer[:SCRIPT_BUFFER_SIZE // 4 + 3] = bytes(SCRIPT_BUFFER_SIZE // 4 + 3)
+        del self.buffer[SCRIPT_BUFFER_SIZE:]
+        self.overrides = bytearray(SCRIPT_OVERRIDES_SIZE * 8)
+
+        missing_files = []
+        scripts: Dict[str, Dict] = {}
+        for file_entry in file_list:
+            try:
+                with open(file_entry["filename"], "rb") as f:
+                    binary_data = f.read()
+            except OSError:
+                missing_files.append(file_entry["filename"])
+                continue
+
+            # Override scripts are keyed by their original address, new scripts by their label
+            address = file_entry.get("address") or 0
+            map_key = f"new_{file_entry['label']}" if address == 0 else f"{address:x}"
+            scripts[map_key] = {
+                "binary_data": binary_data,
+                "label": file_entry["label"],
+                "lua_adjustments": file_entry.get("lua_adjustments") or [],
+                "original_address": address,
+            }
+
+        # First pass: lay out every script
+        buffer_addresses = {}
+        buffer_offset = 0
+        for map_key, script_data in scripts.items():
+            buffer_addresses[map_key] = self.script_buffer + buffer_offset
+            buffer_offset += len(script_data["binary_data"])
+
+        # Second pass: write the data with lua_adjustments applied
+        unresolved_adjustments = []
+        buffer_index = 0
+        for map_key, script_data in scripts.items():
+            # At each offset, the first adjustment whose target label was loaded wins
+            adjusted_addresses: Dict[int, int] = {}
+            for adjustment in script_data["lua_adjustments"]:
+                target = next((target_key for target_key, target_data in scripts.items()
+                               if target_data["label"] == adjustment["label"]), None)
+                if target is None:
+                    unresolved_adjustments.append(f"{script_data['label']}+{adjustment['offset']} -> {adjustment['label']}")
+                elif adjustment["offset"] not in adjusted_addresses:
+                    adjusted_addresses[adjustment["offset"]] = buffer_addresses[target] + adjustment["address_offset"]
+
+            # Like reload(), an adjusted pointer replaces the next 4 bytes, even past the end of the data
+            binary_data = script_data["binary_data"]
+            data = bytearray()
+            byte_index = 0
+            while byte_index < len(binary_data):
+                if byte_index in adjusted_addresses:
+                    data += struct.pack("<I", adjusted_addresses[byte_index])
+                    byte_index += 4
+                else:
+                    data.append(binary_data[byte_index])
+                    byte_index += 1
+            self._write_buffer(buffer_index, data)
+            buffer_index += len(data)
+
+        errors = []
+        if buffer_index > SCRIPT_BUFFER_SIZE:
+            errors.append(f"Scripts overflow the script buffer by {buffer_index - SCRIPT_BUFFER_SIZE} bytes")
+
+        # Mark end of buffer
+        self.buffer[SCRIPT_BUFFER_SIZE - 1] = 0xFF
+
+        override_index = 0
+        for map_key, script_data in scripts.items():
+            if script_data["original_address"] == 0:
+                continue
+            self._write_override(override_index, script_data["original_address"], buffer_addresses[map_key])
+            override_index += 1
+        if override_index > SCRIPT_OVERRIDES_SIZE:
+            errors.append(f"{override_index} overrides exceed the {SCRIPT_OVERRIDES_SIZE} override slots")
+
+        self.initialized = 1
+        self.script_addresses = {script_data["label"]: buffer_addresses[map_key]
+                                 for map_key, script_data in scripts.items()}
+
+        return ReloadReport(len(scripts), buffer_index, override_index, missing_files, unresolved_adjustments, errors)
+
+    def read_script(self, label: str, length: int) -> bytes:
+        """Read the injected bytes of a loaded script"""
+        offset = self.script_addresses[label] - self.script_buffer
+        return bytes(self.buffer[offset:offset + length])
+
+    def image_digest(self) -> str:
+        """Hash the script buffer and override table, to compare injected images between runs"""
+        return hashlib.blake2b(bytes(self.buffer) + bytes(self.overrides), digest_size=8).hexdigest()
+
+    def verify(self, file_list: List[Dict]) -> List[str]:
+        """Check the injected image against the generated files, returning every mismatch"""
+        problems = []
+        overrides = dict(self.get_overrides())
+        for file_entry in file_list:
+            label = file_entry["label"]
+            if label not in self.script_addresses:
+                problems.append(f"{label} was not loaded")
+                continue
+
+            # Every byte must come from the generated file, except pointers to other injected scripts
+            with open(file_entry["filename"], "rb") as f:
+                expected = bytearray(f.read())
+            adjusted_offsets = set()
+            for adjustment in file_entry.get("lua_adjustments") or []:
+                target_address = self.script_addresses.get(adjustment["label"])
+                if target_address is None or adjustment["offset"] in adjusted_offsets:
+                    continue
+                adjusted_offsets.add(adjustment["offset"])
+                if adjustment["offset"] + 4 <= len(expected):
+                    struct.pack_into("<I", expected, adjustment["offset"], target_address + adjustment["address_offset"])
+                else:
+                    problems.append(f"{label} has a pointer adjustment past the end of its data")
+            if self.read_script(label, len(expected)) != bytes(expected):
+                problems.append(f"{label} does not match its generated file")
+
+            address = file_entry.get("address") or 0
+            if address and overrides.get(address) != self.script_addresses[label]:
+                problems.append(f"{label} is not overridden at 0x{address:08x}")
+        return problems
+
+class StandinServer:
+    """A stand-in for the porylive.lua socket server that follows its PROCESSING/RELOAD/ACK contract"""
+
+    def __init__(self, project_dir: Path, port: int = 1370, verbose: bool = False):
+        self.project_dir = project_dir
+        self.port = port
+        self.verbose = verbose
+
+        self.emulator: Optional[StandinEmulator] = None
+        self.generated_files_path: Optional[Path] = None
+        self.last_report: Optional[ReloadReport] = None
+        self.processing_time: Optional[float] = None
+        self.reload_time: Optional[float] = None
+        self.reloaded = threading.Event()
+
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+        self._lock = threading.Lock()
+
+    def setup_project_paths(self):
+        """Find the build directory and porylive addresses, like setup_project_paths() does"""
+        with open(self.project_dir / "build" / "porylive_config.lua", "r") as f:
+            match = re.search(r"current_build_dir\s*=\s*['\"]([^'\"]+)['\"]", f.read())
+        if not match:
+            raise ValueError("Could not find current_build_dir in porylive_config.lua")
+        build_dir = self.project_dir / match.group(1)
+        self.generated_files_path = build_dir / "porylive_generated_files.lua"
+        self.emulator = StandinEmulator(load_addresses(build_dir / "addresses.lua"))
+
+    def handle_message(self, message: str):
+        """Handle a notification from porylive_on_change.py"""
+        with self._lock:
+            if message == "PROCESSING":
+                self.processing_time = time.perf_counter()
+                self.log("[+] Porylive is processing new changes...")
+            elif message == "RELOAD":
+                self.log("[+] Processing complete. Loading new changes...")
+                if self.emulator is None:
+                    self.setup_project_paths()
+                self.last_report = self.emulator.reload(load_generated_files(self.generated_files_path))
+                self.reload_time = time.perf_counter()
+                report = self.last_report
+                self.log(f"[+] All scripts written to buffer ({report.buffer_used / 1024:.1f}kb / "
+                         f"{SCRIPT_BUFFER_SIZE / 1024:.1f}kb, {report.buffer_percentage:.1f}% used; "
+                         f"{SCRIPT_OVERRIDES_SIZE - report.overrides_used} scripts remaining)")
+                self.reloaded.set()
+
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def start(self):
+        """Start listening in a background thread"""
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data = self.request.recv(1024)
+                if data:
+                    message = data.decode("utf-8").strip()
+                    server.handle_message(message)
+                    if message == "RELOAD":
+                        self.request.sendall(f"ACK {message}\n".encode("utf-8"))
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(("localhost", self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        # Announce the endpoint like porylive.lua does once it listens
+        self.announcement_path.write_text(f"{self.port}\n")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self.announcement_path.unlink(missing_ok=True)
+
+    @property
+    def announcement_path(self) -> Path:
+        return self.project_dir / "build" / f"porylive_endpoint_{self.port}.txt"
+
+    def wait_for_reload(self, timeout: float) -> bool:
+        """Wait for the next RELOAD to be applied"""
+        reloaded = self.reloaded.wait(timeout)
+        self.reloaded.clear()
+        return reloaded
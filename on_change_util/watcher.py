@@ -0,0 +1,222 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import re
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .logger import Logger
+
+# inotify flags, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# Seconds between checks for a stop request while waiting for inotify events
+INOTIFY_WAKE_INTERVAL = 0.5
+
+def load_watch_patterns(watchman_json_path: Path) -> List[str]:
+    """Read the file patterns of the porylive watchman trigger"""
+    with open(watchman_json_path, "r") as f:
+        trigger = json.load(f)
+
+    patterns = []
+    def collect(expression):
+        if isinstance(expression, list):
+            if len(expression) >= 2 and expression[0] == "match" and isinstance(expression[1], str):
+                patterns.append(expression[1])
+            else:
+                for term in expression:
+                    collect(term)
+        elif isinstance(expression, dict):
+            collect(expression.get("expression"))
+    collect(trigger)
+    return patterns
+
+def compile_pattern(pattern: str) -> "re.Pattern[str]":
+    """Translate a watchman wholename glob, where only ** matches across directories"""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r"\Z")
+
+def pattern_root(pattern: str) -> str:
+    """Get the directory a pattern's matches are under, e.g. data for data/maps/*/scripts.inc"""
+    directories = []
+    for part in pattern.split("/")[:-1]:
+        if any(wildcard in part for wildcard in "*?["):
+            break
+        directories.append(part)
+    return "/".join(directories)
+
+class FileWatcher:
+    """Reports saves of the files matched by the watchman trigger patterns
+
+    Changes are read from inotify where it is available. Elsewhere, or when
+    forced, every matching file is stat'ed at a fixed interval and compared
+    against the previous snapshot. Changed files are reported relative to
+    the project directory, like watchman does, from a background thread.
+    """
+
+    def __init__(self, logger: Logger, project_dir: Path, patterns: List[str],
+                 poll_interval: float, force_polling: bool = False):
+        self.logger = logger
+        self.project_dir = project_dir
+        self.patterns = [compile_pattern(pattern) for pattern in patterns]
+        # Directories are walked recursively, so roots inside another root are left out
+        roots = sorted({pattern_root(pattern) for pattern in patterns})
+        self.roots = [root for root in roots
+                      if not any(root != other and (other == "" or root.startswith(other + "/")) for other in roots)]
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+
+        self.backend: Optional[str] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def matches(self, relative_path: str) -> bool:
+        return any(pattern.match(relative_path) for pattern in self.patterns)
+
+    def _walk(self) -> Iterator[Tuple[str, List[str]]]:
+        """List the watched directories and their files, relative to the project directory"""
+        for root in self.roots:
+            for directory, subdirectories, files in os.walk(self.project_dir / root):
+                # Skip hidden directories such as .git
+                subdirectories[:] = [name for name in subdirectories if not name.startswith(".")]
+                yield os.path.relpath(directory, self.project_dir), files
+
+    def start(self, on_change: Callable[[List[str]], None]):
+        """Start watching in a background thread"""
+        run = None
+        if not self.force_polling:
+            run = self._start_inotify()
+        if run is None:
+            self.backend = "polling"
+            run = self._run_polling
+        self._thread = threading.Thread(target=run, args=(on_change,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _start_inotify(self) -> Optional[Callable[[Callable[[List[str]], None]], None]]:
+        """Set up inotify watches on every watched directory, if inotify is available"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+        inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        fd = inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            return None
+
+        directories: Dict[int, str] = {}
+        def add_watch(directory: str):
+            wd = inotify_add_watch(fd, os.fsencode(self.project_dir / directory), INOTIFY_MASK)
+            if wd < 0:
+                self.logger.log_message(f"Could not watch {directory}: {os.strerror(ctypes.get_errno())}")
+            else:
+                directories[wd] = directory
+
+        for directory, _ in self._walk():
+            add_watch(directory)
+        self.backend = "inotify"
+
+        def run(on_change: Callable[[List[str]], None]):
+            try:
+                while not self._stopped.is_set():
+                    readable, _, _ = select.select([fd], [], [], INOTIFY_WAKE_INTERVAL)
+                    if not readable:
+                        continue
+                    data = os.read(fd, 65536)
+
+                    changed_files = []
+                    offset = 0
+                    while offset < len(data):
+                        wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+                        offset += INOTIFY_EVENT.size
+                        name = data[offset:offset + name_length].rstrip(b"\0").decode("utf-8", "replace")
+                        offset += name_length
+
+                        if mask & IN_Q_OVERFLOW:
+                            self.logger.log_message("Too many changes at once, some saves may have been missed")
+                            continue
+                        directory = directories.get(wd)
+                        if directory is None:
+                            continue
+                        relative_path = os.path.normpath(os.path.join(directory, name))
+                        if mask & IN_ISDIR:
+                            # Watch new directories too, e.g. a new map
+                            if mask & IN_CREATE and not name.startswith("."):
+                                add_watch(relative_path)
+                        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and self.matches(relative_path):
+                            changed_files.append(relative_path)
+
+                    if changed_files:
+                        on_change(list(dict.fromkeys(changed_files)))
+            finally:
+                os.close(fd)
+        return run
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Get the size and mtime of every matching file"""
+        snapshot = {}
+        for directory, files in self._walk():
+            for name in files:
+                relative_path = os.path.normpath(os.path.join(directory, name))
+                if not self.matches(relative_path):
+                    continue
+                try:
+                    stat = os.stat(self.project_dir / relative_path)
+                except FileNotFoundError:
+                    continue
+                snapshot[relative_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _run_polling(self, on_change: Callable[[List[str]], None]):
+        previous = self._snapshot()
+        while not self._stopped.wait(self.poll_interval):
+            current = self._snapshot()
+            changed_files = [path for path, version in current.items() if previous.get(path) != version]
+            previous = current
+            if changed_files:
+                on_change(changed_files)
+
+def coalesce(changes: "queue.Queue[List[str]]", window: float) -> List[str]:
+    """Wait for changed files, then gather the ones that arrive until the queue is quiet for window seconds"""
+    batch = list(changes.get())
+    while True:
+        try:
+            batch.extend(changes.get(timeout=window))
+        except queue.Empty:
+            return list(dict.fromkeys(batch))
@@ -0,0 +1,181 @@
+import atexit
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+from .porylive_types import LuaAdjustment, RoutineData, SourceResult
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from .config import ConfigManager
+    from .logger import Logger
+    from .map_file import MapFileManager
+    from .porylive_processor import PoryliveProcessor
+
+# State installed in each worker process by _init_worker
+_worker_state: Dict[str, Any] = {}
+
+# Pool of _get_strip_pool and its number of workers
+_strip_pool: Optional["ProcessPoolExecutor"] = None
+_strip_pool_workers = 0
+
+def _init_worker(project_dir: Path, porylive_dir: Path, profiling: bool, label_index_build_dir: Optional[Path],
+                 symbol_index: Optional[Dict[str, int]], sym_file_path: Optional[Path], macro_data: Dict):
+    """Set up a worker process with the read-only data shared by every task
+
+    Workers read the label index themselves when the main process uses
+    one, and are only sent the whole symbol index otherwise.
+    """
+    _worker_state.update({
+        'project_dir': project_dir,
+        'porylive_dir': porylive_dir,
+        'profiling': profiling,
+        'label_index_build_dir': label_index_build_dir,
+        'symbol_index': symbol_index,
+        'sym_file_path': sym_file_path,
+        'macro_data': macro_data,
+        'processor': None,
+    })
+
+def _get_worker_processor() -> "PoryliveProcessor":
+    """Get the processor of this worker process, creating it on first use"""
+    # Imported here to avoid a circular import with porylive_processor
+    from .porylive_processor import PoryliveProcessor
+
+    processor = _worker_state['processor']
+    if processor is None:
+        processor = PoryliveProcessor(_worker_state['project_dir'], _worker_state['porylive_dir'],
+                                      _worker_state['profiling'])
+        processor.config_manager.load_porylive_config()
+        processor.config_manager.set_macro_data(_worker_state['macro_data'])
+        if _worker_state['label_index_build_dir'] is not None:
+            from .label_index import LabelIndex
+            label_index = LabelIndex(processor.logger, _worker_state['label_index_build_dir'])
+            if label_index.load():
+                processor.map_file_manager.use_label_index(label_index)
+            else:
+                # Rebuilt by make live since the main process loaded it
+                processor.map_file_manager.load_sym_file(_worker_state['sym_file_path'])
+        else:
+            processor.map_file_manager.set_symbol_index(_worker_state['symbol_index'], _worker_state['sym_file_path'])
+        _worker_state['processor'] = processor
+    return processor
+
+def _process_source_task(selected_file: str) -> SourceResult:
+    """Run the diff, parse and macro adjustment pipeline for one source"""
+    return _get_worker_processor().process_source(selected_file)
+
+def in_worker() -> bool:
+    """Check whether this is a worker process, where nested pools are avoided"""
+    return bool(_worker_state)
+
+def _strip_lst_range_task(lst_path: Path, start: int, end: int) -> str:
+    """Strip one byte range of an LST file"""
+    # Imported here to avoid a circular import with script_differ
+    from .script_differ import strip_lst_range
+    return strip_lst_range(lst_path, start, end)
+
+def _get_strip_pool(num_workers: int) -> "ProcessPoolExecutor":
+    """Get the pool that strips listings, reused by every save of this process, e.g. in watch mode"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _strip_pool, _strip_pool_workers
+    if _strip_pool is None or _strip_pool_workers < num_workers:
+        if _strip_pool is not None:
+            _strip_pool.shutdown()
+        else:
+            atexit.register(_shutdown_strip_pool)
+        _strip_pool = ProcessPoolExecutor(max_workers=num_workers)
+        _strip_pool_workers = num_workers
+    return _strip_pool
+
+def _shutdown_strip_pool():
+    global _strip_pool
+    if _strip_pool is not None:
+        _strip_pool.shutdown()
+        _strip_pool = None
+
+def strip_lst_files_parallel(lst_paths: List[Path]) -> List[List[str]]:
+    """Strip LST files by splitting each one into label-aligned chunks across worker processes"""
+    from .script_differ import split_lst_ranges
+
+    num_chunks = os.cpu_count() or 1
+    file_ranges = [split_lst_ranges(lst_path, num_chunks) for lst_path in lst_paths]
+    # Label alignment may leave fewer chunks than CPUs, which need no more workers
+    executor = _get_strip_pool(max(1, min(num_chunks, sum(len(ranges) for ranges in file_ranges))))
+
+    # Submit the chunks of every file before waiting on any of them
+    file_futures = [
+        [executor.submit(_strip_lst_range_task, lst_path, start, end) for start, end in ranges]
+        for lst_path, ranges in zip(lst_paths, file_ranges)
+    ]
+
+    stripped_files = []
+    for futures in file_futures:
+        stripped_lines: List[str] = []
+        for future in futures:
+            chunk = future.result()
+            if chunk:
+                stripped_lines.extend(chunk.split("\n"))
+        stripped_files.append(stripped_lines)
+    return stripped_files
+
+def _adjust_routines_task(routines: Dict[str, RoutineData], labels: List[str], src_file: str,
+                          new_script_labels: Set[str], updated_scripts: Set[str]) -> List[Tuple[bytes, List[LuaAdjustment]]]:
+    """Adjust the data of a partition of routines from macros"""
+    lst_parser = _get_worker_processor().lst_parser
+    return [
+        lst_parser.adjust_routine(routines, routines[label], src_file, True, new_script_labels, updated_scripts)
+        for label in labels
+    ]
+
+def adjust_routines_parallel(logger: "Logger", config_manager: "ConfigManager", map_file_manager: "MapFileManager",
+                             routines: Dict[str, RoutineData], labels: List[str], src_file: str,
+                             new_script_labels: Set[str], updated_scripts: Set[str]) -> List[Tuple[bytes, List[LuaAdjustment]]]:
+    """Adjust the data of routines from macros, partitioned by routine across worker processes"""
+    num_workers = os.cpu_count() or 1
+    partition_size = -(-len(labels) // num_workers)
+    partitions = [labels[i:i + partition_size] for i in range(0, len(labels), partition_size)]
+
+    # Macro adjustment only needs the scripts of its own partition, and the
+    # original address of every other routine it may reference
+    addresses_only = {label: {'original_address': routine.get('original_address')} for label, routine in routines.items()}
+
+    with create_pool(logger, config_manager, map_file_manager, num_workers) as executor:
+        futures = []
+        for partition in partitions:
+            partition_routines = dict(addresses_only)
+            partition_routines.update({label: routines[label] for label in partition})
+            futures.append(executor.submit(_adjust_routines_task, partition_routines, partition, src_file,
+                                           new_script_labels, updated_scripts))
+
+        # Partitions are contiguous, so concatenating in order keeps the routine order
+        return [result for future in futures for result in future.result()]
+
+def create_pool(logger: "Logger", config_manager: "ConfigManager", map_file_manager: "MapFileManager",
+                max_workers: int) -> "ProcessPoolExecutor":
+    """Create a process pool sharing the label or symbol index and macro data"""
+    # Imported on first use, as concurrent.futures takes longer to import than the rest of porylive
+    from concurrent.futures import ProcessPoolExecutor
+
+    label_index = map_file_manager.label_index
+    return ProcessPoolExecutor(
+        max_workers=max(1, min(max_workers, os.cpu_count() or 1)),
+        initializer=_init_worker,
+        initargs=(
+            config_manager.project_dir,
+            config_manager.porylive_dir,
+            logger.profiling,
+            label_index.build_dir if label_index is not None else None,
+            map_file_manager.symbol_index if label_index is None else None,
+            map_file_manager.current_sym_file,
+            config_manager.load_macro_data(),
+        ),
+    )
+
+def process_sources_parallel(processor: "PoryliveProcessor", selected_files: List[str]) -> List[SourceResult]:
+    """Process several supported sources at once, one worker process per source"""
+    with create_pool(processor.logger, processor.config_manager, processor.map_file_manager,
+                     len(selected_files)) as executor:
+        # Results are collected in submission order so the merge is deterministic
+        futures = [executor.submit(_process_source_task, selected_file) for selected_file in selected_files]
+        return [future.result() for future in futures]
@@ -15,8 +15,8 @@ local nextID = 1
 local LISTEN_PORT = 1370
 
 -- Path variables
+local project_dir
 local build_dir
-local bin_data_dir
 local generated_files_path
 
 -- Function to convert WSL path to Windows path
@@ -47,12 +47,12 @@ function setup_project_paths(project_root)
     return dofile(project_root .. "build/porylive_config.lua")
   end)
   if status and type(result) == "table" then
+    project_dir = project_root
     build_dir = project_root .. result.current_build_dir
   else
     console:error("[-] Failed to setup project paths")
     return false
   end
-  bin_data_dir = build_dir .. "/bin/data"
   generated_files_path = build_dir .. "/porylive_generated_files.lua"
   
   console:log("[+] Project paths set up:")
@@ -118,15 +118,16 @@ function reload()
   console:log("[+] Successfully loaded " .. #file_list .. " file entries")
 
   -- Steps:
-  -- 1. Find all files in the data build directory, recursively checking subdirectories
-  -- 2. For each filename (format label-address.bin), read the file and get the label and address
+  -- 1. Collect every generated file entry whose binary exists
+  -- 2. For each entry, get the label and original address from the entry itself
+  --    (binaries are content-addressed, so the filename carries no metadata)
   -- 3. Read the binary data and write it to the script buffer at the address
   -- 4. Add the binary data to the script_overrides_map with the address as the key
   -- 5. Loop through the script_overrides_map and write the script to the script buffer at the address
 
-  -- Function to find .bin files without using popen
-  local function find_bin_files(dir)
-    local files = {}
+  -- Function to find the entries whose .bin files exist without using popen
+  local function find_bin_files()
+    local entries = {}
     
     for _, file_entry in ipairs(file_list) do
       local original_filename = convert_wsl_path_to_windows(file_entry.filename)
@@ -134,32 +135,28 @@ function reload()
       local test_file = io.open(original_filename, "rb")
       if test_file then
         test_file:close()
-        table.insert(files, original_filename)
+        table.insert(entries, { path = original_filename, entry = file_entry })
       else
         console:error("[-] File not found: " .. original_filename)
       end
     end
     
-    return files
+    return entries
   end
 
-  -- Find all .bin files in the data build directory
-  local bin_files = find_bin_files(bin_data_dir)
+  -- Find all .bin files referenced by the generated files list
+  local bin_files = find_bin_files()
 
   console:log("[+] Loading " .. #bin_files .. " script overrides")
 
   -- Process each .bin file
   console:log("[+] Scripts to override:")
-  for _, file_path in ipairs(bin_files) do
-    -- Extract filename from full path
-    local filename = file_path:match("([^/]+)$")
-
-    -- Parse filename format: label-address.bin
-    local label, address_str = filename:match("^(.+)%-(%d+)%.bin$")
-
-    if label and address_str then
-      local address = tonumber(address_str)
+  for _, bin_file in ipairs(bin_files) do
+    local file_path = bin_file.path
+    local label = bin_file.entry.label
+    local address = bin_file.entry.address or 0
 
+    if label then
       -- Read binary data from file
       local file_handle = io.open(file_path, "rb")
       if file_handle then
@@ -183,18 +180,10 @@ function reload()
         script_overrides_map[map_key] = {
           binary_data = binary_data,
           label = label,
-          lua_adjustments = nil,  -- Will be set below if found
+          lua_adjustments = bin_file.entry.lua_adjustments,
           is_new_script = (address == 0),  -- Mark if this is a new script (address 0)
           original_address = address  -- Store original address for reference
         }
-
-        -- Check if this file has lua_adjustments in the file_list
-        for _, file_entry in ipairs(file_list) do
-          if file_entry.filename == file_path and file_entry.lua_adjustments then
-            script_overrides_map[map_key].lua_adjustments = file_entry.lua_adjustments
-            break
-          end
-        end
         
         if address == 0 then
           console:log("      " .. label .. " \t(" .. #binary_data .. " bytes) [NEW SCRIPT]")
@@ -205,7 +194,7 @@ function reload()
         console:log("[-] Failed to open file: " .. file_path)
       end
     else
-      console:log("[-] Failed to parse filename: " .. filename)
+      console:log("[-] Generated file entry has no label: " .. file_path)
     end
   end
 
@@ -364,6 +353,11 @@ function socket_received(id)
         console:log("[+] Processing complete. Loading new changes...")
         reload()
       end
+      -- Acknowledge RELOAD once it is applied, so porylive can time each instance.
+      -- PROCESSING is not acknowledged, porylive closes the socket right after sending it
+      if message == "RELOAD" then
+        sock:send("ACK " .. message .. "\n")
+      end
       -- Close the socket after processing RELOAD to avoid error messages
       socket_stop(id)
       return
@@ -394,6 +388,18 @@ function socket_accept()
   -- console:log(socket_format(id, "Connected"))
 end
 
+-- Announce the port of this instance, so porylive notifies every running mGBA
+function announce_endpoint(port)
+  local announcement_path = project_dir .. "build/porylive_endpoint_" .. port .. ".txt"
+  local file = io.open(announcement_path, "w")
+  if file then
+    file:write(port .. "\n")
+    file:close()
+  else
+    console:error("[-] Failed to announce port " .. port .. " in " .. announcement_path)
+  end
+end
+
 -- Initialize socket server
 function init_socket_server()
   local port = LISTEN_PORT
@@ -420,6 +426,7 @@ function init_socket_server()
       else
         console:log("[+] Listening on port " .. port .. " for updates")
         server:add("received", socket_accept)
+        announce_endpoint(port)
       end
     end
   end
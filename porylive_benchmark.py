@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Porylive Benchmarks
+
+Measures the performance of individual porylive stages outside of a live
+session, so changes to the pipeline can be compared against each other.
+
+Usage:
+    python porylive_benchmark.py strip <lst_file> [--repeat N]
+    python porylive_benchmark.py latency <project_dir> <edits_json> [--timeout SECONDS]
+    python porylive_benchmark.py serve <project_dir>
+    python porylive_benchmark.py replay <session_zip|project_dir>
+    python porylive_benchmark.py startup [--repeat N]
+
+The edits file of the latency benchmark is a JSON list of edits, applied
+and processed one at a time, for example:
+    [
+        {"file": "data/battle_anim_scripts.s", "replace": ["delay 1", "delay 2"]},
+        {"file": "data/scripts/example.inc", "append": "Example_New::\n\tend\n"}
+    ]
+
+The replay benchmark runs the cycles of a session recorded with
+PORYLIVE_RECORD=1 through the diff and parser again, and checks that they
+still produce the recorded generated files.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from on_change_util.artifact_store import ArtifactStore
+from on_change_util.logger import Logger
+from on_change_util.manifest import GeneratedFilesManifest
+from on_change_util.porylive_processor import PoryliveProcessor
+from on_change_util.recorder import digest_entries, find_latest_session, load_session, read_blob
+from on_change_util.standin import SCRIPT_BUFFER_SIZE, SCRIPT_OVERRIDES_SIZE, StandinServer, load_generated_files
+from on_change_util.script_differ import ScriptDiffer, PARALLEL_STRIP_THRESHOLD
+from on_change_util.workers import strip_lst_files_parallel
+
+# Startup budgets, in milliseconds on top of starting a bare interpreter.
+# Only checked when `porylive_benchmark.py startup` is run by hand
+STARTUP_REJECT_BUDGET_MS = 50
+STARTUP_IMPORT_BUDGET_MS = 75
+
+def best_of(repeat: int, func):
+    """Run func repeat times and return the fastest time and the last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark_strip(args) -> bool:
+    """Compare serial and parallel LST stripping"""
+    lst_path = Path(args.lst_file)
+    differ = ScriptDiffer(Logger(Path.cwd()), None)
+
+    serial_time, serial_lines = best_of(args.repeat, lambda: differ.strip_lst_file(lst_path))
+    # The first parallel strip of a process also starts the worker processes, later ones reuse them
+    cold_time, _ = best_of(1, lambda: strip_lst_files_parallel([lst_path])[0])
+    parallel_time, parallel_lines = best_of(args.repeat, lambda: strip_lst_files_parallel([lst_path])[0])
+
+    size = lst_path.stat().st_size
+    print(f"{lst_path}: {size / 1024 / 1024:.1f} MiB, {len(serial_lines)} stripped lines, {os.cpu_count()} CPU(s)")
+    print(f"  serial:   {serial_time:.4f}s ({serial_time * 1000 / (size / 1024 / 1024):.1f}ms/MiB)")
+    print(f"  parallel: {parallel_time:.4f}s ({serial_time / parallel_time:.2f}x), "
+          f"{cold_time:.4f}s when starting the workers ({serial_time / cold_time:.2f}x)")
+    used = "parallel" if size >= PARALLEL_STRIP_THRESHOLD and (os.cpu_count() or 1) > 1 else "serial"
+    print(f"  threshold: {PARALLEL_STRIP_THRESHOLD / 1024 / 1024:.1f} MiB, porylive uses the {used} path for this file")
+
+    if serial_lines != parallel_lines:
+        print("Error: parallel output differs from serial output", file=sys.stderr)
+        return False
+    return True
+
+def apply_edit(project_dir: Path, edit: dict) -> bool:
+    """Apply one scripted edit to a file of the project"""
+    path = project_dir / edit["file"]
+    content = path.read_text()
+    if "replace" in edit:
+        old, new = edit["replace"]
+        if old not in content:
+            print(f"Error: {old!r} not found in {edit['file']}", file=sys.stderr)
+            return False
+        content = content.replace(old, new, 1)
+    if "append" in edit:
+        content += edit["append"]
+    path.write_text(content)
+    return True
+
+def benchmark_latency(args) -> bool:
+    """Measure save-to-injected latency of scripted edits against a local mGBA stand-in"""
+    project_dir = Path(args.project_dir).resolve()
+    porylive_dir = Path(__file__).parent
+    with open(args.edits_json, "r") as f:
+        edits = json.load(f)
+
+    # Every edit is processed as soon as it is saved
+    os.environ["PORYLIVE_DEBOUNCE_MS"] = "0"
+
+    # Each stand-in announces itself, so every edit is broadcast to all of them
+    servers = [StandinServer(project_dir, port=1370 + index) for index in range(args.instances)]
+    for server in servers:
+        server.start()
+    originals = {}
+    latencies = []
+    success = True
+    try:
+        for step, edit in enumerate(edits, 1):
+            path = project_dir / edit["file"]
+            originals.setdefault(path, path.read_text())
+
+            save_time = time.perf_counter()
+            if not apply_edit(project_dir, edit):
+                return False
+
+            processor = PoryliveProcessor(project_dir, porylive_dir)
+            try:
+                processed = processor.process_files([edit["file"]])
+            except SystemExit:
+                processed = False
+            reloaded = [server for server in servers if processed and server.wait_for_reload(args.timeout)]
+            if len(reloaded) < len(servers):
+                print(f"step {step}: {edit['file']} was not injected into {len(servers) - len(reloaded)} "
+                      f"instance(s), see .porylive/porylive_on_change.log")
+                success = False
+                continue
+
+            # The edit is injected once the last instance reloaded
+            latency = max(server.reload_time for server in servers) - save_time
+            latencies.append(latency)
+            stages = ", ".join(f"{stage} {seconds:.4f}s" for stage, seconds in processor.timings.items())
+            print(f"step {step}: {edit['file']}: {latency:.4f}s save to injected ({stages})")
+
+            acks = {delivery.port: delivery.ack_time for delivery in processor.notification_manager.last_deliveries}
+            for server in servers:
+                report = server.last_report
+                ack_time = acks.get(server.port)
+                ack = f"acknowledged in {ack_time * 1000:.1f}ms, " if ack_time is not None else ""
+                print(f"  port {server.port}: {server.reload_time - save_time:.4f}s, {ack}"
+                      f"buffer {report.buffer_used / 1024:.1f}kb / {SCRIPT_BUFFER_SIZE / 1024:.1f}kb "
+                      f"({report.buffer_percentage:.1f}%), {report.overrides_used} / {SCRIPT_OVERRIDES_SIZE} overrides, "
+                      f"{report.scripts} script(s), image {server.emulator.image_digest()}")
+
+                # Check the injected image against the generated files
+                problems = report.errors + [f"missing {filename}" for filename in report.missing_files] \
+                    + [f"unresolved {adjustment}" for adjustment in report.unresolved_adjustments] \
+                    + server.emulator.verify(load_generated_files(server.generated_files_path))
+                for problem in problems:
+                    print(f"  Error: {problem}")
+                success = success and not problems
+    finally:
+        for path, content in originals.items():
+            path.write_text(content)
+        for server in servers:
+            server.stop()
+
+    if latencies:
+        print(f"{len(latencies)} edit(s): mean {statistics.mean(latencies):.4f}s, "
+              f"median {statistics.median(latencies):.4f}s, max {max(latencies):.4f}s")
+    return success
+
+def replay_session(args) -> bool:
+    """Replay a recorded session offline and compare its timings and outputs with the recording"""
+    archive_path = Path(args.session).resolve()
+    if archive_path.is_dir():
+        archive_path = find_latest_session(archive_path)
+        if archive_path is None:
+            print(f"Error: no recorded sessions in {args.session}/.porylive/sessions", file=sys.stderr)
+            return False
+    cycles = load_session(archive_path)
+    print(f"{archive_path}: {len(cycles)} cycle(s)")
+
+    recorded_times = []
+    replayed_times = []
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp_dir, zipfile.ZipFile(archive_path, "r") as archive:
+        # A minimal project whose build directory holds the recorded listings
+        project_dir = Path(tmp_dir)
+        build_dir = project_dir / "build" / "replay"
+        build_dir.mkdir(parents=True)
+        (project_dir / "build" / "porylive_config.lua").write_text("current_build_dir = 'build/replay'\n")
+        porylive_dir = project_dir / "porylive"
+        porylive_dir.mkdir()
+        (project_dir / ".porylive").mkdir()
+
+        for step, cycle in enumerate(cycles, 1):
+            os.environ["PORYLIVE_ROLLING_BASELINE"] = "1" if cycle['rolling_baseline'] else "0"
+            (porylive_dir / "porylive_macro_data.json").write_bytes(read_blob(archive, cycle['macro_data']))
+            sym_path = build_dir / "replay.sym"
+            sym_path.write_bytes(read_blob(archive, cycle['sym_file']))
+
+            processor = PoryliveProcessor(project_dir, porylive_dir)
+            processor.map_file_manager.load_sym_file(sym_path)
+            store = ArtifactStore(processor.logger, build_dir / "bin" / "objects")
+            manifest = GeneratedFilesManifest(processor.logger, build_dir)
+            shutil.rmtree(project_dir / ".porylive" / "baseline", ignore_errors=True)
+
+            replay_time = 0.0
+            for source, recorded in cycle['sources'].items():
+                src_lst_old, src_lst_live = processor.get_lst_paths(source)
+                src_lst_old.parent.mkdir(parents=True, exist_ok=True)
+                src_lst_old.write_bytes(read_blob(archive, recorded['old_listing']))
+                src_lst_live.write_bytes(read_blob(archive, recorded['new_listing']))
+
+                # Start from the recorded baseline, which identifies the original listing by its mtime
+                if recorded['baseline']:
+                    mtime_ns = recorded['baseline']['state']['original_listing'][0]
+                    os.utime(src_lst_old, ns=(mtime_ns, mtime_ns))
+                    processor.baseline_store.restore(source, recorded['baseline'])
+                    processor.baseline_store.commit(source)
+                manifest.update_source(source, [{**entry, 'filename': str(store.blob_path(entry['filename']))}
+                                                for entry in recorded['previous_entries']])
+
+                source_start = time.perf_counter()
+                result = processor.process_source(source)
+                replay_time += time.perf_counter() - source_start
+
+                outputs = result['carried_entries'] + processor.file_manager.write_binary_files(
+                    result['routines'], store, source)
+                if digest_entries(outputs) != recorded['outputs']:
+                    print(f"  Error: cycle {step}: {source} differs from the recorded generated files")
+                    mismatches += 1
+
+            recorded_time = cycle['timings'].get('process', 0.0)
+            recorded_times.append(recorded_time)
+            replayed_times.append(replay_time)
+            print(f"cycle {step}: {', '.join(cycle['sources'])}: recorded {recorded_time:.4f}s, "
+                  f"replayed {replay_time:.4f}s")
+
+    if cycles:
+        recorded_total = sum(recorded_times)
+        replayed_total = sum(replayed_times)
+        ratio = f" ({replayed_total / recorded_total:.2f}x)" if recorded_total else ""
+        print(f"{len(cycles)} cycle(s): recorded {recorded_total:.4f}s, replayed {replayed_total:.4f}s{ratio}, "
+              f"{mismatches} mismatch(es)")
+    return mismatches == 0
+
+def benchmark_startup(args) -> bool:
+    """Check that rejecting an unsupported file and importing the processor stay within their budgets"""
+    porylive_dir = Path(__file__).parent.resolve()
+
+    def run_interpreter(*interpreter_args: str, env=None) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, *interpreter_args], cwd=porylive_dir, env=env,
+                              capture_output=True, text=True)
+
+    success = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        (Path(tmp_dir) / ".porylive").mkdir()
+        env = {**os.environ, "PORYLIVE_PROJECT_DIR": tmp_dir}
+
+        bare_time, _ = best_of(args.repeat, lambda: run_interpreter("-c", "pass"))
+        reject_time, _ = best_of(args.repeat, lambda: run_interpreter("porylive_on_change.py", "README.md", env=env))
+        import_time, _ = best_of(args.repeat, lambda: run_interpreter("-c", "import on_change_util.porylive_processor"))
+
+    reject_ms = (reject_time - bare_time) * 1000
+    import_ms = (import_time - bare_time) * 1000
+    print(f"bare interpreter: {bare_time * 1000:.1f}ms")
+    print(f"  reject an unsupported file: +{reject_ms:.1f}ms (budget {args.reject_budget:.0f}ms)")
+    print(f"  import the processor:       +{import_ms:.1f}ms (budget {args.import_budget:.0f}ms)")
+    if reject_ms > args.reject_budget or import_ms > args.import_budget:
+        print("Error: startup is over budget", file=sys.stderr)
+        success = False
+
+    # The slowest imports of the processor, by cumulative time
+    result = run_interpreter("-X", "importtime", "-c", "import on_change_util.porylive_processor")
+    imports = []
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and fields[1].strip().isdigit():
+            imports.append((int(fields[1]), fields[2].strip()))
+    for cumulative_us, module in sorted(imports, reverse=True)[:args.top]:
+        print(f"    {cumulative_us / 1000:6.1f}ms {module}")
+
+    # Importing the package itself must not import any of its modules
+    result = run_interpreter("-c", "import sys, on_change_util; "
+                             "print(' '.join(sorted(m for m in sys.modules if m.startswith('on_change_util.'))))")
+    if result.stdout.strip():
+        print(f"Error: importing on_change_util also imports {result.stdout.strip()}", file=sys.stderr)
+        success = False
+    return success
+
+def serve_standin(args) -> bool:
+    """Run the mGBA stand-in until interrupted, logging reloads like porylive.lua does"""
+    server = StandinServer(Path(args.project_dir).resolve(), verbose=True)
+    server.start()
+    print(f"[+] Stand-in listening on port {server.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark porylive processing stages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    strip_parser = subparsers.add_parser("strip", help="Compare serial and parallel LST stripping")
+    strip_parser.add_argument("lst_file", help="Path to a .lst file, e.g. build/modern-porylive/data/event_scripts.lst")
+    strip_parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the fastest is reported")
+    strip_parser.set_defaults(func=benchmark_strip)
+
+    # The stand-ins listen on port 1370 and up like porylive.lua, so mGBA must not be running
+    latency_parser = subparsers.add_parser("latency", help="Measure save-to-injected latency against an mGBA stand-in")
+    latency_parser.add_argument("project_dir", help="Path to a project built with make live")
+    latency_parser.add_argument("edits_json", help="Path to a JSON list of edits to apply and process in order")
+    latency_parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for each reload")
+    latency_parser.add_argument("--instances", type=int, default=1,
+                                help="Number of stand-ins, on consecutive ports from 1370, to broadcast to")
+    latency_parser.set_defaults(func=benchmark_latency)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the mGBA stand-in on its own")
+    serve_parser.add_argument("project_dir", help="Path to a project built with make live")
+    serve_parser.set_defaults(func=serve_standin)
+
+    replay_parser = subparsers.add_parser("replay", help="Replay a recorded session and check its outputs")
+    replay_parser.add_argument("session", help="Path to a session archive, or to a project to replay its latest session")
+    replay_parser.set_defaults(func=replay_session)
+
+    startup_parser = subparsers.add_parser("startup", help="Check the startup time of porylive_on_change.py against its budgets, "
+                                                                "run by hand after changing imports")
+    startup_parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the fastest is reported")
+    startup_parser.add_argument("--reject-budget", type=float, default=STARTUP_REJECT_BUDGET_MS,
+                                help="Milliseconds allowed to reject an unsupported file")
+    startup_parser.add_argument("--import-budget", type=float, default=STARTUP_IMPORT_BUDGET_MS,
+                                help="Milliseconds allowed to import the processor")
+    startup_parser.add_argument("--top", type=int, default=5, help="Number of slowest imports to list")
+    startup_parser.set_defaults(func=benchmark_startup)
+
+    args = parser.parse_args()
+    if not args.func(args):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,16 @@ import sys
 import re
 import os
 import subprocess
+from pathlib import Path
 
-def extract_and_write_lua(map_file_path, output_lua_path):
+from on_change_util.elf_symbols import ElfSymbolError, read_sym_file, write_sym_file
+from on_change_util.label_index import write_label_index
+
+def extract_and_write_lua(map_file_path, output_lua_path, symbol_index=None):
     """
     Parses a GBA .map file to find specific symbol addresses and writes them
-    into a Lua file as a table.
+    into a Lua file as a table. If symbol_index is given, the addresses are
+    looked up in it instead of scanning the file.
     """
     symbols_to_find = {
         "gPoryLiveScriptInitialized": None,
@@ -23,6 +28,12 @@ def extract_and_write_lua(map_file_path, output_lua_path):
 
 
     try:
+        if symbol_index is not None:
+            for symbol_name in symbols_to_find:
+                if symbol_name in symbol_index:
+                    found_addresses[symbol_name] = f"0x{symbol_index[symbol_name]:08x}"
+            return write_addresses_lua(map_file_path, output_lua_path, symbols_to_find, found_addresses)
+
         with open(map_file_path, 'r') as f:
             for line in f:
                 line = line.strip()
@@ -48,6 +59,10 @@ def extract_and_write_lua(map_file_path, output_lua_path):
         print(f"Error processing map file '{map_file_path}': {e}", file=sys.stderr)
         return False # Indicate failure
 
+    return write_addresses_lua(map_file_path, output_lua_path, symbols_to_find, found_addresses)
+
+def write_addresses_lua(map_file_path, output_lua_path, symbols_to_find, found_addresses):
+    """Write the found symbol addresses into a Lua file as a table"""
     # Ensure the output directory exists
     output_dir = os.path.dirname(output_lua_path)
     if output_dir:
@@ -88,30 +103,42 @@ if __name__ == "__main__":
     map_file = sys.argv[1]
     output_lua = sys.argv[2]
 
-    print(f"Generating {map_file.replace('.map', '.sym')}...")
-
-    # Run `PORYLIVE=1 make syms`, then replace the map file with the .sym file
-    # for backwards compatibility
-    env = os.environ.copy()
-    env["PORYLIVE"] = "1"
-    # Remove jobserver environment variables to avoid jobserver issues
-    env.pop("MAKEFLAGS", None)
-    env.pop("MFLAGS", None)
-    try:
-        result = subprocess.run(
-            ["make", "-j1", "syms"],  # Use -j1 to avoid parallel job issues
-            cwd=os.getcwd(),
-            env=env,
-            check=True,
-            capture_output=True,
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"Error: Failed to run `make syms`", file=sys.stderr)
-        if e.stderr:
-            print(e.stderr.decode("utf-8"), file=sys.stderr)
-        sys.exit(1)
-
-    map_file = map_file.replace(".map", ".sym")
+    elf_file = map_file.replace(".map", ".elf")
+    sym_file = map_file.replace(".map", ".sym")
+    print(f"Generating {sym_file}...")
+
+    # Read the symbol table straight from the linked ELF file, which is much
+    # faster than `make syms`, and only fall back to it without an ELF file
+    symbol_index = None
+    if os.path.exists(elf_file):
+        try:
+            symbol_index = write_sym_file(Path(elf_file), Path(sym_file))
+        except (ElfSymbolError, OSError) as e:
+            print(f"Warning: Could not read symbols from {elf_file}: {e}", file=sys.stderr)
+
+    if symbol_index is None:
+        # Run `PORYLIVE=1 make syms`, then replace the map file with the .sym file
+        # for backwards compatibility
+        env = os.environ.copy()
+        env["PORYLIVE"] = "1"
+        # Remove jobserver environment variables to avoid jobserver issues
+        env.pop("MAKEFLAGS", None)
+        env.pop("MFLAGS", None)
+        try:
+            result = subprocess.run(
+                ["make", "-j1", "syms"],  # Use -j1 to avoid parallel job issues
+                cwd=os.getcwd(),
+                env=env,
+                check=True,
+                capture_output=True,
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"Error: Failed to run `make syms`", file=sys.stderr)
+            if e.stderr:
+                print(e.stderr.decode("utf-8"), file=sys.stderr)
+            sys.exit(1)
+
+    map_file = sym_file
     if not os.path.exists(map_file):
         print(f"Error: {map_file} does not exist", file=sys.stderr)
         sys.exit(1)
@@ -128,7 +155,16 @@ if __name__ == "__main__":
         f.write(f"  current_build_dir = '{build_dir}',\n")
         f.write( "}\n")
 
-    if not extract_and_write_lua(map_file, output_lua):
+    if not extract_and_write_lua(map_file, output_lua, symbol_index):
         print(f"Error: Not all required symbols were found in {map_file}. Check {output_lua}.", file=sys.stderr)
         sys.exit(1)
+
+    # Index the labels of the original listings, so saves do not have to read the sym file
+    try:
+        if symbol_index is None:
+            symbol_index = read_sym_file(Path(map_file))
+        macro_data_file = Path(__file__).resolve().parent / "porylive_macro_data.json"
+        write_label_index(Path(build_dir), Path(map_file), symbol_index, macro_data_file)
+    except OSError as e:
+        print(f"Warning: Could not write the label index: {e}", file=sys.stderr)
     sys.exit(0) # Ensure exit code 0 on success or warning
@@ -11,8 +11,9 @@ import sys
 import os
 from pathlib import Path
 
-# Import after path modification
-from on_change_util.porylive_processor import PoryliveProcessor
+# Only the lightweight modules are imported up front, so unsupported files are rejected quickly
+from on_change_util.logger import Logger
+from on_change_util.porylive_types import is_supported_file
 
 # Constants
 PROFILING = False
@@ -30,15 +31,34 @@ def main():
         # Fall back to default behavior
         project_dir = porylive_dir.parent.parent
 
+    # Get the updated files from command line arguments
+    updated_files = sys.argv[1:]
+
+    # Watch for changes in this process instead of being run by watchman for each one
+    if updated_files == ["--watch"]:
+        from on_change_util.porylive_processor import PoryliveProcessor
+        PoryliveProcessor(project_dir, porylive_dir, PROFILING).watch(porylive_dir / "watchman.json")
+        return
+
+    # Only process unsaved editor buffers, while watchman runs porylive for saves
+    if updated_files == ["--speculate"]:
+        from on_change_util.porylive_processor import PoryliveProcessor
+        PoryliveProcessor(project_dir, porylive_dir, PROFILING).serve_speculation()
+        return
+
+    # Reject unsupported files before loading the processor
+    if updated_files and not any(is_supported_file(updated_file) for updated_file in updated_files):
+        Logger(project_dir, PROFILING).log_message(f"File not supported with porylive: {' '.join(updated_files)}")
+        sys.exit(1)
+
+    from on_change_util.porylive_processor import PoryliveProcessor
+
     try:
         # Initialize the processor
         processor = PoryliveProcessor(project_dir, porylive_dir, PROFILING)
 
-        # Get the updated file from command line arguments
-        updated_file = sys.argv[1] if len(sys.argv) > 1 else None
-
-        # Process the file
-        success = processor.process_file(updated_file)
+        # Process the files
+        success = processor.process_files(updated_files)
 
         if not success:
             sys.exit(1)